@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+
+import os
+import json
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+# Separator used to build the order-independent key for a pair of users
+PAIR_SEPARATOR = "\x1f"
+
+_conn = None
+_lock = threading.Lock()
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY,
+    sender TEXT NOT NULL,
+    recipient TEXT NOT NULL,
+    pair_key TEXT NOT NULL,
+    timestamp INTEGER NOT NULL,
+    content TEXT NOT NULL,
+    read INTEGER NOT NULL DEFAULT 0,
+    is_file INTEGER NOT NULL DEFAULT 0,
+    file_id TEXT
+);
+CREATE INDEX IF NOT EXISTS msgs_pair ON messages(pair_key, timestamp);
+CREATE INDEX IF NOT EXISTS msgs_sender ON messages(sender, recipient, timestamp);
+CREATE INDEX IF NOT EXISTS msgs_unread ON messages(recipient, read);
+CREATE TABLE IF NOT EXISTS chats (
+    owner TEXT NOT NULL,
+    peer TEXT NOT NULL,
+    timestamp INTEGER NOT NULL,
+    content TEXT NOT NULL,
+    is_file INTEGER NOT NULL DEFAULT 0,
+    unread INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (owner, peer)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS chats_recent ON chats(owner, timestamp);
+"""
+
+# Keeps the chat list entry of one side of a conversation pointing at its latest
+# message and adds to its unread counter
+UPSERT_CHAT = (
+    "INSERT INTO chats (owner, peer, timestamp, content, is_file, unread) VALUES (?, ?, ?, ?, ?, ?) "
+    "ON CONFLICT (owner, peer) DO UPDATE SET "
+    "unread = chats.unread + excluded.unread, "
+    "content = CASE WHEN excluded.timestamp >= chats.timestamp THEN excluded.content ELSE chats.content END, "
+    "is_file = CASE WHEN excluded.timestamp >= chats.timestamp THEN excluded.is_file ELSE chats.is_file END, "
+    "timestamp = MAX(chats.timestamp, excluded.timestamp)"
+)
+
+def to_timestamp(value):
+    """Convert a stored or legacy ISO timestamp to integer nanoseconds"""
+    if isinstance(value, int):
+        return value
+    try:
+        dt = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return 0
+    return int(dt.timestamp()) * 1_000_000_000 + dt.microsecond * 1000
+
+def format_timestamp(ns):
+    """Format integer nanoseconds as the ISO timestamp sent to clients"""
+    seconds, remainder = divmod(ns, 1_000_000_000)
+    return datetime.fromtimestamp(seconds).replace(microsecond=remainder // 1000).isoformat()
+
+def pair_key(user1, user2):
+    """Get the key shared by both directions of a conversation"""
+    if user2 < user1:
+        user1, user2 = user2, user1
+    return f"{user1}{PAIR_SEPARATOR}{user2}"
+
+def init_db(path):
+    """Open the message database and create the schema if needed"""
+    global _conn
+
+    _conn = sqlite3.connect(path, check_same_thread=False)
+    _conn.row_factory = sqlite3.Row
+    _conn.execute("PRAGMA journal_mode=WAL")
+    _conn.execute("PRAGMA synchronous=NORMAL")
+    _conn.execute("PRAGMA temp_store=MEMORY")
+    _conn.executescript(SCHEMA)
+    _conn.commit()
+
+    return _conn
+
+def _row_to_message(row):
+    """Convert a database row to the message dict used by the API"""
+    message = {
+        'id': row['id'],
+        'sender': row['sender'],
+        'recipient': row['recipient'],
+        'content': row['content'],
+        'timestamp': format_timestamp(row['timestamp']),
+        'read': bool(row['read']),
+        'is_file': bool(row['is_file'])
+    }
+
+    if row['file_id'] is not None:
+        message['file_id'] = row['file_id']
+
+    return message
+
+def _insert_message(message_data):
+    """Insert a message and update the chat list of both users
+
+    Must be called with the lock held, inside a transaction. A message
+    without a timestamp is stamped here, so timestamps follow insert order.
+    """
+    sender = message_data['sender']
+    recipient = message_data['recipient']
+    if 'timestamp' in message_data:
+        timestamp = to_timestamp(message_data['timestamp'])
+    else:
+        timestamp = time.time_ns()
+    content = message_data.get('content', '')
+    is_file = int(message_data.get('is_file', False))
+    read = int(message_data.get('read', False))
+
+    _conn.execute(
+        "INSERT INTO messages (sender, recipient, pair_key, timestamp, content, read, is_file, file_id) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        (sender, recipient, pair_key(sender, recipient), timestamp, content,
+         read, is_file, message_data.get('file_id'))
+    )
+    _conn.execute(UPSERT_CHAT, (recipient, sender, timestamp, content, is_file, 1 - read))
+    if recipient != sender:
+        _conn.execute(UPSERT_CHAT, (sender, recipient, timestamp, content, is_file, 0))
+
+def add_message(message_data):
+    """Store a single message and update the chat list of both users"""
+    with _lock, _conn:
+        _insert_message(message_data)
+
+def get_messages(user1, user2):
+    """Get all messages between two users, oldest first"""
+    with _lock:
+        rows = _conn.execute(
+            "SELECT * FROM messages WHERE pair_key = ? ORDER BY timestamp, id",
+            (pair_key(user1, user2),)
+        ).fetchall()
+
+    return [_row_to_message(row) for row in rows]
+
+def count_messages(user1, user2):
+    """Get the number of messages between two users"""
+    with _lock:
+        return _conn.execute(
+            "SELECT COUNT(*) FROM messages WHERE pair_key = ?",
+            (pair_key(user1, user2),)
+        ).fetchone()[0]
+
+def read_conversation(reader, other, offset=0, limit=None, after=0):
+    """Get the messages between two users, oldest first, and mark the ones sent to reader as read
+
+    offset and limit select a page of the conversation, and after skips the
+    message with that id and everything before it. Messages are ordered by
+    (timestamp, id), and ids of imported messages don't follow that order, so
+    after is compared by its row's position rather than by id. The UPDATE
+    only runs when the fetched messages contain something unread, and it is
+    bounded by the last fetched row so a message that arrives in between is
+    not marked read before it has been returned.
+    """
+    with _lock:
+        position = (-1, 0)
+        if after:
+            row = _conn.execute("SELECT timestamp, id FROM messages WHERE id = ?", (after,)).fetchone()
+            if row:
+                position = (row['timestamp'], row['id'])
+
+        rows = _conn.execute(
+            "SELECT * FROM messages WHERE pair_key = ? AND (timestamp, id) > (?, ?) "
+            "ORDER BY timestamp, id LIMIT ? OFFSET ?",
+            (pair_key(reader, other), *position, -1 if limit is None else limit, offset)
+        ).fetchall()
+
+        messages = []
+        unread = False
+        for row in rows:
+            message = _row_to_message(row)
+            if message['recipient'] == reader and not message['read']:
+                message['read'] = True
+                unread = True
+            messages.append(message)
+
+        if unread:
+            with _conn:
+                cursor = _conn.execute(
+                    "UPDATE messages SET read = 1 "
+                    "WHERE recipient = ? AND sender = ? AND read = 0 AND (timestamp, id) <= (?, ?)",
+                    (reader, other, rows[-1]['timestamp'], rows[-1]['id'])
+                )
+                _conn.execute(
+                    "UPDATE chats SET unread = MAX(unread - ?, 0) WHERE owner = ? AND peer = ?",
+                    (cursor.rowcount, reader, other)
+                )
+
+    return messages
+
+def get_user_chats(username):
+    """Get the last message and unread count for every conversation of a user, newest first"""
+    with _lock:
+        rows = _conn.execute(
+            "SELECT peer, content, timestamp, is_file, unread "
+            "FROM chats WHERE owner = ? ORDER BY timestamp DESC",
+            (username,)
+        ).fetchall()
+
+    return [{
+        'username': row['peer'],
+        'last_message': row['content'],
+        'timestamp': format_timestamp(row['timestamp']),
+        'is_file': bool(row['is_file']),
+        'unread': row['unread']
+    } for row in rows]
+
+def get_sent_file_ids(username):
+    """Get the ids of all files sent by a user"""
+    with _lock:
+        rows = _conn.execute(
+            "SELECT file_id FROM messages WHERE sender = ? AND is_file = 1 AND file_id IS NOT NULL",
+            (username,)
+        ).fetchall()
+
+    return [row['file_id'] for row in rows]
+
+def delete_chat(user1, user2):
+    """Delete all messages between two users"""
+    with _lock, _conn:
+        _conn.execute("DELETE FROM messages WHERE pair_key = ?", (pair_key(user1, user2),))
+        _conn.execute(
+            "DELETE FROM chats WHERE (owner = ? AND peer = ?) OR (owner = ? AND peer = ?)",
+            (user1, user2, user2, user1)
+        )
+
+def delete_user_messages(username):
+    """Delete all messages sent or received by a user"""
+    with _lock, _conn:
+        _conn.execute("DELETE FROM messages WHERE sender = ? OR recipient = ?", (username, username))
+        _conn.execute("DELETE FROM chats WHERE owner = ? OR peer = ?", (username, username))
+
+def import_json_messages(messages_dir):
+    """Import legacy per-pair JSON message files into the database
+
+    Each imported file is renamed with a .migrated suffix so it is only
+    imported once.
+    """
+    if not os.path.isdir(messages_dir):
+        return 0
+
+    with os.scandir(messages_dir) as entries:
+        file_paths = sorted(entry.path for entry in entries
+                            if entry.name.endswith('.json') and entry.is_file())
+
+    imported = 0
+    for file_path in file_paths:
+        try:
+            with open(file_path, 'r') as f:
+                messages = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            continue
+
+        # Import the whole file in one transaction
+        with _lock, _conn:
+            for message in messages:
+                if isinstance(message, dict) and message.get('sender') and message.get('recipient'):
+                    _insert_message(message)
+                    imported += 1
+
+        os.replace(file_path, file_path + '.migrated')
+
+    return imported
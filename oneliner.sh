@@ -27,12 +27,15 @@ if [[ ":$PATH:" != *":$HOME/.local/bin:"* ]]; then
     export PATH="$HOME/.local/bin:$PATH"
 fi
 
+# Create the tc command shortcut next to terminalchat
+python3 "$HOME/.local/bin/terminalchat" install
+
 # Clean up
 cd - > /dev/null
 rm -rf "$TMP_DIR"
 
 echo "✅ TerminalChat installed successfully!"
-echo "You can now use the 'terminalchat' command from your terminal."
+echo "You can now use the 'terminalchat' command, or 'tc' for short, from your terminal."
 echo ""
 echo "🚀 Quick Start Guide:"
 echo "  terminalchat signup     - Create a new account"
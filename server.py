@@ -4,25 +4,52 @@ import os
 import json
 import time
 import uuid
+import queue
+import atexit
+import secrets
 import shutil
+import tempfile
+import threading
 import warnings
 
 # Suppress all warnings
 warnings.filterwarnings("ignore")
 
+import orjson
 import urllib3
 from datetime import datetime
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, request, jsonify, g, send_file as flask_send_file
+from flask.json.provider import JSONProvider
 from flask_cors import CORS
+from flask_compress import Compress
 from werkzeug.utils import secure_filename
 import hashlib
+import hmac
+
+import db
 
 # Suppress urllib3 warnings
 urllib3.disable_warnings()
 
+class OrjsonProvider(JSONProvider):
+    """Serialize jsonify responses and parse request bodies with orjson"""
+    
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj).decode()
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 CORS(app)  # Enable CORS for all routes
 
+# Compress JSON responses such as long chat histories
+app.config['COMPRESS_MIMETYPES'] = ['application/json']
+app.config['COMPRESS_LEVEL'] = 5
+app.config['COMPRESS_MIN_SIZE'] = 1024
+Compress(app)
+
 # Constants
 DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "server_data")
 USERS_FILE = os.path.join(DATA_DIR, "users.json")
@@ -30,6 +57,7 @@ MESSAGES_DIR = os.path.join(DATA_DIR, "messages")
 FILES_DIR = os.path.join(DATA_DIR, "files")
 TOKENS_FILE = os.path.join(DATA_DIR, "tokens.json")
 BLOCKED_FILE = os.path.join(DATA_DIR, "blocked.json")
+DB_FILE = os.path.join(DATA_DIR, "chat.db")
 
 # Ensure directories exist
 os.makedirs(DATA_DIR, exist_ok=True)
@@ -49,123 +77,163 @@ if not os.path.exists(BLOCKED_FILE):
     with open(BLOCKED_FILE, 'w') as f:
         json.dump({}, f)
 
-# Helper functions
-def get_users():
-    """Get all users from the users file"""
+# Open the message database and pull in any legacy JSON message files
+db.init_db(DB_FILE)
+db.import_json_messages(MESSAGES_DIR)
+
+def load_json_file(path):
+    """Load a JSON data file, returning an empty dict if it is missing or corrupt"""
     try:
-        with open(USERS_FILE, 'r') as f:
-            return json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
+        with open(path, 'rb') as f:
+            return orjson.loads(f.read())
+    except (FileNotFoundError, orjson.JSONDecodeError):
         return {}
 
+# In-memory copies of the data files, loaded once and mutated in place.
+# Writes are flushed to disk by a background writer thread.
+_LOCK = threading.RLock()
+_WRITE_QUEUE = queue.Queue()
+_USERS = load_json_file(USERS_FILE)
+_TOKENS = load_json_file(TOKENS_FILE)
+# Each user's blocked users are kept as a set, and stored as a list
+_BLOCKED = {user: set(blocked) for user, blocked in load_json_file(BLOCKED_FILE).items()}
+
+# How long the writer waits for further saves before flushing a batch
+WRITE_DEBOUNCE = 0.05
+
+def write_json_file(path, data):
+    """Atomically replace a JSON data file"""
+    # mkstemp creates the file with 0600 permissions
+    fd, tmp_path = tempfile.mkstemp(dir=DATA_DIR, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except Exception:
+        os.unlink(tmp_path)
+        raise
+
+def _writer():
+    """Write queued data file snapshots to disk
+
+    Saves that arrive within WRITE_DEBOUNCE of each other are coalesced so
+    each file is only written once, with its latest snapshot.
+    """
+    while True:
+        batch = [_WRITE_QUEUE.get()]
+        time.sleep(WRITE_DEBOUNCE)
+        while True:
+            try:
+                batch.append(_WRITE_QUEUE.get_nowait())
+            except queue.Empty:
+                break
+        
+        latest = dict(batch)
+        for path, data in latest.items():
+            try:
+                write_json_file(path, data)
+            except Exception:
+                app.logger.exception("Failed to write %s", path)
+        
+        for _ in batch:
+            _WRITE_QUEUE.task_done()
+
+threading.Thread(target=_writer, name="json-writer", daemon=True).start()
+
+# Make sure pending writes reach the disk before the process exits
+atexit.register(_WRITE_QUEUE.join)
+
+def _persist(path, cache, data, snapshot_of=dict):
+    """Update an in-memory cache and queue a snapshot of it for writing"""
+    with _LOCK:
+        if data is not cache:
+            cache.clear()
+            cache.update(data)
+        snapshot = snapshot_of(cache)
+    _WRITE_QUEUE.put((path, snapshot))
+
+# Helper functions
+def get_users():
+    """Get all users"""
+    return _USERS
+
 def save_users(users):
     """Save users to the users file"""
-    with open(USERS_FILE, 'w') as f:
-        json.dump(users, f, indent=2)
+    _persist(USERS_FILE, _USERS, users)
 
 def get_tokens():
-    """Get all tokens from the tokens file"""
-    try:
-        with open(TOKENS_FILE, 'r') as f:
-            return json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        return {}
+    """Get all tokens"""
+    return _TOKENS
 
 def save_tokens(tokens):
     """Save tokens to the tokens file"""
-    with open(TOKENS_FILE, 'w') as f:
-        json.dump(tokens, f, indent=2)
+    _persist(TOKENS_FILE, _TOKENS, tokens)
 
-def get_user_by_token(token):
-    """Get a user by their token"""
-    # Extract the token from the Bearer format if present
-    if token and token.startswith('Bearer '):
-        token = token[7:]
-        
-    tokens = get_tokens()
-    if token in tokens:
-        return tokens[token]
-    return None
+def get_blocked():
+    """Get the blocked users of every user"""
+    return _BLOCKED
+
+def save_blocked(blocked):
+    """Save blocked users to the blocked file"""
+    _persist(BLOCKED_FILE, _BLOCKED, blocked,
+             lambda cache: {user: sorted(names) for user, names in cache.items()})
+
+def hash_password(password, salt):
+    """Hash a password with scrypt"""
+    return hashlib.scrypt(password.encode(), salt=salt.encode(), n=16384, r=8, p=1, dklen=32).hex()
+
+def verify_password(user, password):
+    """Check a password against a stored user record"""
+    if user.get('hash_scheme') == 'scrypt':
+        hashed_password = hash_password(password, user['salt'])
+    else:
+        # Accounts created before scrypt store a single salted SHA-256 round
+        hashed_password = hashlib.sha256((password + user['salt']).encode()).hexdigest()
+    
+    return hmac.compare_digest(hashed_password, user['password_hash'])
+
+def parse_token(token):
+    """Extract the token from the Bearer format if present"""
+    return token.removeprefix('Bearer ') if token else token
 
 def get_messages(sender, recipient):
     """Get messages between two users"""
-    message_path = os.path.join(MESSAGES_DIR, f"{sender}_{recipient}.json")
-    reverse_path = os.path.join(MESSAGES_DIR, f"{recipient}_{sender}.json")
-    
-    messages = []
-    
-    # Check if the message file exists
-    if os.path.exists(message_path):
-        try:
-            with open(message_path, 'r') as f:
-                messages.extend(json.load(f))
-        except json.JSONDecodeError:
-            pass
-    
-    # Check if the reverse message file exists
-    if os.path.exists(reverse_path):
-        try:
-            with open(reverse_path, 'r') as f:
-                messages.extend(json.load(f))
-        except json.JSONDecodeError:
-            pass
-    
-    # Sort messages by timestamp
-    messages.sort(key=lambda x: x.get('timestamp', ''))
-    
-    return messages
+    return db.get_messages(sender, recipient)
 
 def save_message(sender, recipient, message_data):
     """Save a message between two users"""
-    # Create a unique message file for this pair of users
-    message_path = os.path.join(MESSAGES_DIR, f"{sender}_{recipient}.json")
-    
-    # Load existing messages or create a new list
-    if os.path.exists(message_path):
-        with open(message_path, 'r') as f:
-            messages = json.load(f)
-    else:
-        messages = []
-    
-    # Add the new message
-    messages.append(message_data)
-    
-    # Save the messages
-    with open(message_path, 'w') as f:
-        json.dump(messages, f, indent=2)
+    db.add_message(message_data)
 
 def get_user_chats(username):
-    """Get all chats for a user"""
-    chats = []
-    for filename in os.listdir(MESSAGES_DIR):
-        if filename.endswith('.json'):
-            parts = filename.split('_')
-            if len(parts) >= 2:
-                user1 = parts[0]
-                user2 = parts[1].split('.')[0]
-                
-                if user1 == username or user2 == username:
-                    other_user = user2 if user1 == username else user1
-                    
-                    # Get the messages
-                    messages = get_messages(user1, user2)
-                    
-                    if messages:
-                        last_message = messages[-1]
-                        chats.append({
-                            'username': other_user,
-                            'last_message': last_message.get('content', ''),
-                            'timestamp': last_message.get('timestamp', ''),
-                            'is_file': last_message.get('is_file', False),
-                            'unread': sum(1 for msg in messages if msg.get('recipient') == username and not msg.get('read', False))
-                        })
-    
-    # Sort chats by timestamp (newest first)
-    chats.sort(key=lambda x: x['timestamp'], reverse=True)
-    
-    return chats
+    """Get all chats for a user, newest first"""
+    return db.get_user_chats(username)
 
 # API Routes
+@app.before_request
+def load_user():
+    """Resolve the Authorization header once per request"""
+    g.token = parse_token(request.headers.get('Authorization'))
+    g.user = _TOKENS.get(g.token) if g.token else None
+
+def auth_error():
+    """Get the error response for a request without a valid token"""
+    if not g.token:
+        return jsonify({'error': 'Authorization token is required'}), 401
+    return jsonify({'error': 'Invalid token'}), 401
+
+def issue_token(username):
+    """Generate and save a new auth token for a user"""
+    token = uuid.uuid4().hex
+    
+    with _LOCK:
+        tokens = get_tokens()
+        tokens[token] = username
+        save_tokens(tokens)
+    
+    return token
+
 @app.route('/signup', methods=['POST'])
 def signup():
     """Create a new user account"""
@@ -176,25 +244,30 @@ def signup():
     if not username or not password:
         return jsonify({'error': 'Username and password are required'}), 400
     
-    users = get_users()
-    
-    if username in users:
-        return jsonify({'error': 'Username already exists'}), 400
-    
     # Hash the password
     salt = uuid.uuid4().hex
-    hashed_password = hashlib.sha256((password + salt).encode()).hexdigest()
+    hashed_password = hash_password(password, salt)
     
-    # Create the user
-    users[username] = {
-        'password_hash': hashed_password,
-        'salt': salt,
-        'created_at': datetime.now().isoformat()
-    }
+    with _LOCK:
+        users = get_users()
+        
+        if username in users:
+            return jsonify({'error': 'Username already exists'}), 400
+        
+        # Create the user
+        users[username] = {
+            'password_hash': hashed_password,
+            'hash_scheme': 'scrypt',
+            'salt': salt,
+            'created_at': datetime.now().isoformat()
+        }
+        
+        save_users(users)
     
-    save_users(users)
+    # Log the new user in straight away so the client doesn't need a separate login request
+    token = issue_token(username)
     
-    return jsonify({'success': True, 'message': 'User created successfully'}), 201
+    return jsonify({'success': True, 'message': 'User created successfully', 'token': token}), 201
 
 @app.route('/login', methods=['POST'])
 def login():
@@ -212,89 +285,71 @@ def login():
         return jsonify({'error': 'Invalid username or password'}), 401
     
     user = users[username]
-    salt = user['salt']
-    hashed_password = hashlib.sha256((password + salt).encode()).hexdigest()
     
-    if hashed_password != user['password_hash']:
+    if not verify_password(user, password):
         return jsonify({'error': 'Invalid username or password'}), 401
     
-    # Generate a token
-    token = uuid.uuid4().hex
+    # Upgrade legacy SHA-256 hashes now that we know the password
+    if user.get('hash_scheme') != 'scrypt':
+        with _LOCK:
+            users[username] = dict(user, password_hash=hash_password(password, user['salt']), hash_scheme='scrypt')
+            save_users(users)
     
-    # Save the token
-    tokens = get_tokens()
-    tokens[token] = username
-    save_tokens(tokens)
+    token = issue_token(username)
     
     return jsonify({'success': True, 'token': token}), 200
 
 @app.route('/users', methods=['GET'])
 def users():
     """Get all users"""
-    token = request.headers.get('Authorization')
-    
-    if not token:
-        return jsonify({'error': 'Authorization token is required'}), 401
-    
-    username = get_user_by_token(token)
+    username = g.user
     
     if not username:
-        return jsonify({'error': 'Invalid token'}), 401
-    
-    users = get_users()
+        return auth_error()
     
-    # Remove password hashes and salts
-    user_list = [{'username': u} for u in users.keys() if u != username]
+    # Remove password hashes and salts. The users dict is shared, so build the
+    # list under the lock in case a signup adds to it meanwhile.
+    with _LOCK:
+        user_list = [{'username': u} for u in get_users() if u != username]
     
     return jsonify(user_list), 200
 
 @app.route('/messages/<recipient>', methods=['GET'])
 def get_user_messages(recipient):
     """Get messages between the current user and another user"""
-    token = request.headers.get('Authorization')
-    
-    if not token:
-        return jsonify({'error': 'Authorization token is required'}), 401
-    
-    sender = get_user_by_token(token)
+    sender = g.user
     
     if not sender:
-        return jsonify({'error': 'Invalid token'}), 401
-    
-    # Get the messages
-    messages = get_messages(sender, recipient)
+        return auth_error()
     
-    # Mark messages as read
-    for message in messages:
-        if message.get('recipient') == sender and not message.get('read', False):
-            message['read'] = True
+    offset = request.args.get('offset', type=int)
+    limit = request.args.get('limit', type=int)
+    after = request.args.get('after', type=int)
     
-    # Save the updated messages
-    message_path = os.path.join(MESSAGES_DIR, f"{sender}_{recipient}.json")
-    reverse_path = os.path.join(MESSAGES_DIR, f"{recipient}_{sender}.json")
+    # Without paging arguments return the whole conversation
+    if offset is None and limit is None and after is None:
+        # Get the messages and mark the ones sent to us as read
+        messages = db.read_conversation(sender, recipient)
+        return jsonify(messages), 200
     
-    if os.path.exists(message_path):
-        with open(message_path, 'w') as f:
-            json.dump([m for m in messages if m.get('sender') == sender], f, indent=2)
+    # A negative offset counts back from the newest message
+    total = db.count_messages(sender, recipient)
+    offset = offset or 0
+    if offset < 0:
+        offset = max(0, total + offset)
     
-    if os.path.exists(reverse_path):
-        with open(reverse_path, 'w') as f:
-            json.dump([m for m in messages if m.get('sender') == recipient], f, indent=2)
+    # after only returns the messages newer than the one with that id
+    messages = db.read_conversation(sender, recipient, offset, limit, after or 0)
     
-    return jsonify(messages), 200
+    return jsonify({'messages': messages, 'total': total}), 200
 
 @app.route('/messages/<recipient>', methods=['POST'])
 def send_message(recipient):
     """Send a message to another user"""
-    token = request.headers.get('Authorization')
-    
-    if not token:
-        return jsonify({'error': 'Authorization token is required'}), 401
-    
-    sender = get_user_by_token(token)
+    sender = g.user
     
     if not sender:
-        return jsonify({'error': 'Invalid token'}), 401
+        return auth_error()
     
     data = request.json
     content = data.get('content')
@@ -307,12 +362,11 @@ def send_message(recipient):
         'sender': sender,
         'recipient': recipient,
         'content': content,
-        'timestamp': datetime.now().isoformat(),
         'read': False,
         'is_file': False
     }
     
-    # Save the message
+    # Save the message, which stamps it with the time it is stored at
     save_message(sender, recipient, message_data)
     
     return jsonify({'success': True, 'message': 'Message sent successfully'}), 201
@@ -320,15 +374,10 @@ def send_message(recipient):
 @app.route('/files/<recipient>', methods=['POST'])
 def send_file(recipient):
     """Send a file to another user"""
-    token = request.headers.get('Authorization')
-    
-    if not token:
-        return jsonify({'error': 'Authorization token is required'}), 401
-    
-    sender = get_user_by_token(token)
+    sender = g.user
     
     if not sender:
-        return jsonify({'error': 'Invalid token'}), 401
+        return auth_error()
     
     if 'file' not in request.files:
         return jsonify({'error': 'No file part'}), 400
@@ -342,11 +391,12 @@ def send_file(recipient):
     filename = secure_filename(file.filename)
     
     # Create a unique filename
-    unique_filename = f"{uuid.uuid4().hex}_{filename}"
+    unique_filename = f"{secrets.token_hex(16)}_{filename}"
     
-    # Save the file
+    # Stream the upload to disk in large chunks
     file_path = os.path.join(FILES_DIR, unique_filename)
-    file.save(file_path)
+    with open(file_path, 'wb', buffering=0) as dst:
+        shutil.copyfileobj(file.stream, dst, length=1024 * 1024)
     
     # Create the message
     message_data = {
@@ -354,12 +404,11 @@ def send_file(recipient):
         'recipient': recipient,
         'content': filename,
         'file_id': unique_filename,
-        'timestamp': datetime.now().isoformat(),
         'read': False,
         'is_file': True
     }
     
-    # Save the message
+    # Save the message, which stamps it with the time it is stored at
     save_message(sender, recipient, message_data)
     
     return jsonify({'success': True, 'message': 'File sent successfully'}), 201
@@ -367,15 +416,10 @@ def send_file(recipient):
 @app.route('/files/<file_id>', methods=['GET'])
 def download_file(file_id):
     """Download a file"""
-    token = request.headers.get('Authorization')
-    
-    if not token:
-        return jsonify({'error': 'Authorization token is required'}), 401
-    
-    username = get_user_by_token(token)
+    username = g.user
     
     if not username:
-        return jsonify({'error': 'Invalid token'}), 401
+        return auth_error()
     
     # Check if the file exists
     file_path = os.path.join(FILES_DIR, file_id)
@@ -386,21 +430,17 @@ def download_file(file_id):
     # Get the original filename
     original_filename = file_id.split('_', 1)[1]
     
-    # Return the file
-    return send_file(file_path, as_attachment=True, download_name=original_filename)
+    # Return the file, letting the WSGI server use sendfile where it can
+    return flask_send_file(file_path, as_attachment=True, download_name=original_filename,
+                           conditional=True, max_age=0)
 
 @app.route('/chats', methods=['GET'])
 def get_chats():
     """Get all chats for the current user"""
-    token = request.headers.get('Authorization')
-    
-    if not token:
-        return jsonify({'error': 'Authorization token is required'}), 401
-    
-    username = get_user_by_token(token)
+    username = g.user
     
     if not username:
-        return jsonify({'error': 'Invalid token'}), 401
+        return auth_error()
     
     # Get the chats
     chats = get_user_chats(username)
@@ -410,102 +450,79 @@ def get_chats():
 @app.route('/chats/<username>', methods=['DELETE'])
 def delete_chat(username):
     """Delete chat history with another user"""
-    token = request.headers.get('Authorization')
-    
-    if not token:
-        return jsonify({'error': 'Authorization token is required'}), 401
-    
-    current_user = get_user_by_token(token)
+    current_user = g.user
     
     if not current_user:
-        return jsonify({'error': 'Invalid token'}), 401
+        return auth_error()
     
-    # Delete the message files
-    message_path = os.path.join(MESSAGES_DIR, f"{current_user}_{username}.json")
-    reverse_path = os.path.join(MESSAGES_DIR, f"{username}_{current_user}.json")
-    
-    if os.path.exists(message_path):
-        os.remove(message_path)
-    
-    if os.path.exists(reverse_path):
-        os.remove(reverse_path)
+    # Delete the messages
+    db.delete_chat(current_user, username)
     
     return jsonify({'success': True, 'message': 'Chat deleted successfully'}), 200
 
 @app.route('/account', methods=['DELETE'])
 def delete_account():
     """Delete a user account"""
-    token = request.headers.get('Authorization')
-    
-    if not token:
-        return jsonify({'error': 'Authorization token is required'}), 401
-    
-    # Extract the token from the Bearer format
-    if token.startswith('Bearer '):
-        token = token[7:]
-    
-    username = get_user_by_token(token)
+    username = g.user
     
     if not username:
-        return jsonify({'error': 'Invalid token'}), 401
+        return auth_error()
     
-    # Get all users
-    users = get_users()
-    
-    # Check if the user exists
-    if username not in users:
-        return jsonify({'error': 'User not found'}), 404
+    with _LOCK:
+        # Get all users
+        users = get_users()
+        
+        # Check if the user exists
+        if username not in users:
+            return jsonify({'error': 'User not found'}), 404
+        
+        # Delete the user
+        del users[username]
+        save_users(users)
+        
+        # Drop the user's own block list
+        blocked = get_blocked()
+        if blocked.pop(username, None) is not None:
+            save_blocked(blocked)
     
-    # Delete the user
-    del users[username]
-    save_users(users)
+    # Look up the files sent by this user before their messages are gone
+    file_ids = db.get_sent_file_ids(username)
     
     # Delete all messages involving this user
-    for filename in os.listdir(MESSAGES_DIR):
-        if filename.endswith('.json'):
-            parts = filename.split('_')
-            if len(parts) >= 2:
-                user1 = parts[0]
-                user2 = parts[1].split('.')[0]
-                
-                if user1 == username or user2 == username:
-                    os.remove(os.path.join(MESSAGES_DIR, filename))
+    db.delete_user_messages(username)
     
     # Delete all files sent by this user
-    for filename in os.listdir(FILES_DIR):
-        file_path = os.path.join(FILES_DIR, filename)
-        if os.path.isfile(file_path):
-            try:
-                with open(file_path, 'r') as f:
-                    file_data = json.load(f)
-                    if file_data.get('sender') == username:
-                        os.remove(file_path)
-            except:
-                pass
+    for file_id in file_ids:
+        try:
+            os.remove(os.path.join(FILES_DIR, file_id))
+        except FileNotFoundError:
+            pass
     
     # Delete the token
-    tokens = get_tokens()
-    for t, user in list(tokens.items()):
-        if user == username:
-            del tokens[t]
-    save_tokens(tokens)
+    with _LOCK:
+        tokens = get_tokens()
+        for t, user in list(tokens.items()):
+            if user == username:
+                del tokens[t]
+        save_tokens(tokens)
     
     return jsonify({'success': True, 'message': 'Account deleted successfully'}), 200
 
 @app.route('/logout', methods=['POST'])
 def logout():
     """Log out a user"""
-    token = request.headers.get('Authorization')
+    token = g.token
     
     if not token:
         return jsonify({'success': True, 'message': 'Already logged out'}), 200
     
     # Remove the token
-    tokens = get_tokens()
-    
-    if token in tokens:
-        del tokens[token]
-        save_tokens(tokens)
+    with _LOCK:
+        tokens = get_tokens()
+        
+        if token in tokens:
+            del tokens[token]
+            save_tokens(tokens)
     
     return jsonify({'success': True, 'message': 'Logged out successfully'}), 200
 
@@ -521,20 +538,10 @@ def status():
 @app.route('/user/<username>', methods=['GET'])
 def check_user(username):
     """Check if a user exists"""
-    token = request.headers.get('Authorization')
-    
-    if not token:
-        return jsonify({'error': 'Authorization token is required'}), 401
-    
-    # Extract the token from the Bearer format if present
-    if token.startswith('Bearer '):
-        token = token[7:]
-    
-    # Verify the token
-    requester = get_user_by_token(token)
+    requester = g.user
     
     if not requester:
-        return jsonify({'error': 'Invalid token'}), 401
+        return auth_error()
     
     # Get all users
     users = get_users()
@@ -547,38 +554,21 @@ def check_user(username):
 @app.route('/blocked/<username>', methods=['GET'])
 def check_blocked(username):
     """Check if a user is blocked"""
-    token = request.headers.get('Authorization')
-    
-    if not token:
-        return jsonify({'error': 'Authorization token is required'}), 401
-    
-    # Extract the token from the Bearer format if present
-    if token.startswith('Bearer '):
-        token = token[7:]
-    
-    # Verify the token
-    requester = get_user_by_token(token)
+    requester = g.user
     
     if not requester:
-        return jsonify({'error': 'Invalid token'}), 401
+        return auth_error()
     
     # Get blocked users
-    blocked_file = os.path.join(DATA_DIR, 'blocked.json')
-    blocked_data = {}
-    
-    if os.path.exists(blocked_file):
-        try:
-            with open(blocked_file, 'r') as f:
-                blocked_data = json.load(f)
-        except json.JSONDecodeError:
-            blocked_data = {}
+    blocked_data = get_blocked()
     
     # Check if the user is blocked
-    is_blocked = (username in blocked_data.get(requester, []) or 
-                  requester in blocked_data.get(username, []))
+    is_blocked = (username in blocked_data.get(requester, ()) or 
+                  requester in blocked_data.get(username, ()))
     
     return jsonify({'blocked': is_blocked}), 200
 
 if __name__ == '__main__':
+    # Development server only, production runs wsgi:application under gunicorn
     port = int(os.environ.get('PORT', 5001))
-    app.run(host='0.0.0.0', port=port, debug=False)
+    app.run(host='0.0.0.0', port=port, debug=False, threaded=True)
@@ -14,6 +14,7 @@ setup(
     entry_points={
         "console_scripts": [
             "terminalchat=terminalchat:main",
+            "tc=terminalchat:main",
         ],
     },
     py_modules=["terminalchat"],
@@ -52,6 +52,9 @@ $PYTHON_CMD install -q -r "$APP_DIR/requirements.txt" || {
     echo "Warning: Failed to install dependencies. Continuing anyway..."
 }
 
+# Create the tc command shortcut
+python3 "$APP_DIR/terminalchat.py" install > /dev/null
+
 # Check if command was provided
 if [ $# -eq 0 ]; then
     echo -e "\033[1;33mUsage: ./tc-online.sh <command> [arguments]\033[0m"
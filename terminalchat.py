@@ -3,58 +3,60 @@
 import os
 import sys
 import json
+import stat
 import time
-import argparse
-import getpass
-import platform
 import subprocess
 import shutil
-import tempfile
-import warnings
-
-# Suppress all warnings
-warnings.filterwarnings("ignore")
-
-import requests
-from rich.console import Console
-from rich.table import Table
-from rich.panel import Panel
-from rich.prompt import Prompt, Confirm
-from rich.progress import Progress
-from rich.markdown import Markdown
-from rich import box
+import threading
+from types import SimpleNamespace
 from datetime import datetime
+from functools import lru_cache
 from getpass import getpass  # Use getpass instead of getpass.getpass
-import urllib3
-import re
 
-# Suppress urllib3 warnings
-urllib3.disable_warnings()
+# Install the required packages if they are missing.
+# rich and requests are imported where they are used, so commands that don't
+# need them start faster.
+import importlib.util
+if any(importlib.util.find_spec(module) is None for module in ("rich", "requests", "requests_toolbelt")):
+    print("Installing required packages...")
+    subprocess.check_call([sys.executable, "-m", "pip", "install", "rich", "requests", "requests-toolbelt"])
 
-# Try to import required packages, install if missing
+# Use orjson for local data files when it is installed
 try:
-    from rich.console import Console
-    from rich.table import Table
-    from rich.panel import Panel
-    from rich.text import Text
-    from rich.progress import Progress
-    import rich.box
-    import requests
+    import orjson
+    
+    def json_loads(data):
+        return orjson.loads(data)
+    
+    def json_dumps(obj, indent=False):
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0)
 except ImportError:
-    print("Installing required packages...")
-    subprocess.check_call([sys.executable, "-m", "pip", "install", "rich", "requests"])
+    def json_loads(data):
+        return json.loads(data)
     
-    # Now import the packages
-    from rich.console import Console
-    from rich.table import Table
-    from rich.panel import Panel
-    from rich.text import Text
-    from rich.progress import Progress
-    import rich.box
-    import requests
+    def json_dumps(obj, indent=False):
+        return json.dumps(obj, indent=2 if indent else None).encode()
+
+# Console for rich output, created on first use
+_CONSOLE = None
+
+def get_console():
+    """Get the rich console, importing rich the first time"""
+    global _CONSOLE
+    
+    if _CONSOLE is None:
+        from rich.console import Console
+        _CONSOLE = Console()
+    
+    return _CONSOLE
 
-# Create console for rich output
-console = Console()
+class LazyConsole:
+    """Forward everything to the rich console, so rich is only imported once something is printed"""
+    
+    def __getattr__(self, name):
+        return getattr(get_console(), name)
+
+console = LazyConsole()
 
 # Constants
 APP_DIR = os.path.expanduser("~/.terminalchat")
@@ -64,6 +66,9 @@ FILES_DIR = os.path.join(APP_DIR, "files")
 CONFIG_FILE = os.path.join(APP_DIR, "config.json")
 BLOCKED_FILE = os.path.join(APP_DIR, "blocked.json")
 MAX_FILE_SIZE = 5 * 1024 * 1024 * 1024  # 5GB in bytes
+COPY_CHUNK_SIZE = 4 * 1024 * 1024  # Bytes copied per step of a local file copy
+UPLOAD_BLOCK_SIZE = 1024 * 1024  # Bytes of a request body written to the socket at a time
+PROGRESS_MIN_SIZE = 1024 * 1024  # Smallest upload that shows a progress bar
 DOWNLOADS_DIR = os.path.expanduser("~/Downloads")  # Default downloads directory
 DATA_DIR = os.path.join(APP_DIR, "data")
 
@@ -71,72 +76,176 @@ DATA_DIR = os.path.join(APP_DIR, "data")
 SERVER_URL = os.environ.get('TERMINALCHAT_SERVER_URL', 'https://terminalchat-server.onrender.com')  # Default to online server
 USE_SERVER = True  # Always use server mode for internet messaging
 
+# Shared HTTP session so consecutive requests reuse keep-alive connections.
+# Created by get_session on first use, under the lock so the background new
+# message check and the foreground command don't each build one.
+_SESSION = None
+_SESSION_LOCK = threading.Lock()
+
 # Update configuration
 REPO_URL = "https://github.com/terminalchat/terminalchat"
 VERSION = "1.0.0"
 COPYRIGHT = " Shortcut Studios"
 MESSAGES_PER_PAGE = 20  # Number of messages to show per page
+BLOCK_CHECK_TTL = 30  # Seconds a block check result is reused for
+PAGE_CACHE_SIZE = 8  # Pages of messages kept in memory for paging back and forth
+NEW_MESSAGES_CHECK_TTL = 30  # Seconds an unread message count is reused for
+
+# Parsed config file and the mtime it was read at
+_CONFIG_CACHE = {'mtime': None, 'data': None}
+
+# Parsed blocked users file and the mtime it was read at
+_BLOCKED_CACHE = {'mtime': None, 'data': {}}
+
+# Parsed local message files, keyed by path, with the mtime they were read at
+_MESSAGES_CACHE = {}
+
+# Message directories of users that are known to exist, keyed by username
+_USER_MESSAGE_DIRS = {}
+
+# Futures for pages of conversations fetched from the server, keyed by
+# (recipient, page) with the most recently used last, and the thread that
+# prefetches them
+_PAGE_CACHE = {}
+_PAGE_PREFETCHER = None
+
+# Last page of each conversation seen so far, keyed by recipient
+_LAST_PAGES = {}
+
+# Recent block check results, keyed by (sender, recipient), with the time they were made
+_BLOCK_CHECK_CACHE = {}
+
+# Time and unread message count of the last new message check, and the lock
+# that lets a foreground check wait for the one started at launch
+_NEW_MESSAGES_CHECK = None
+_NEW_MESSAGES_LOCK = threading.Lock()
+
+# Windows notifier, created on the first notification
+_TOASTER = None
+
+def read_json_file(path):
+    """Read and parse a JSON data file"""
+    with open(path, 'rb') as f:
+        return json_loads(f.read())
+
+def write_json_file(path, data, indent=False):
+    """Serialize data to a JSON data file"""
+    with open(path, 'wb') as f:
+        f.write(json_dumps(data, indent))
+
+def replace_json_file(path, data, indent=False):
+    """Atomically replace a JSON data file, so an interrupted write can't truncate it"""
+    import tempfile
+    
+    # mkstemp creates a uniquely named file with 0600 permissions, so two
+    # writers at the same time can't clobber each other's temporary file
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(json_dumps(data, indent))
+        os.replace(tmp_path, path)
+    except Exception:
+        os.unlink(tmp_path)
+        raise
+
+def create_json_file(path, data):
+    """Create a JSON file with the given contents unless it already exists
+    
+    The existence check and the create are a single open call.
+    """
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        return
+    with os.fdopen(fd, 'wb') as f:
+        f.write(json_dumps(data, indent=True))
 
 # Setup application directories
 def setup_app_directories():
     """Setup application directories"""
-    # Create app directory if it doesn't exist
-    os.makedirs(APP_DIR, exist_ok=True)
-    
-    # Create downloads directory if it doesn't exist
-    os.makedirs(DOWNLOADS_DIR, exist_ok=True)
-    
-    # Create data directory if it doesn't exist
-    os.makedirs(DATA_DIR, exist_ok=True)
-    
-    # Create users file if it doesn't exist
-    if not os.path.exists(USERS_FILE):
-        with open(USERS_FILE, 'w') as f:
-            json.dump({}, f)
-    
-    # Create config file if it doesn't exist
-    if not os.path.exists(CONFIG_FILE):
-        with open(CONFIG_FILE, 'w') as f:
-            json.dump({
-                'logged_in': False,
-                'username': None,
-                'token': None,
-                'server_url': SERVER_URL,
-                'use_server': USE_SERVER
-            }, f, indent=2)
-    
-    # Create blocked users file if it doesn't exist
-    if not os.path.exists(BLOCKED_FILE):
-        with open(BLOCKED_FILE, 'w') as f:
-            json.dump([], f)
+    # Create the app, downloads and data directories if they don't exist
+    for directory in (APP_DIR, DOWNLOADS_DIR, DATA_DIR):
+        os.makedirs(directory, exist_ok=True)
+    
+    # Create the users, config and blocked users files if they don't exist
+    create_json_file(USERS_FILE, {})
+    create_json_file(CONFIG_FILE, {
+        'logged_in': False,
+        'username': None,
+        'token': None,
+        'server_url': SERVER_URL,
+        'use_server': USE_SERVER
+    })
+    create_json_file(BLOCKED_FILE, [])
 
 # Server communication functions
-def server_request(endpoint, method="GET", data=None, files=None, token=None, progress_callback=None):
-    """Make a request to the server"""
+def get_session():
+    """Get the HTTP session shared by all server requests"""
+    global _SESSION
+    
+    if _SESSION is not None:
+        return _SESSION
+    
+    with _SESSION_LOCK:
+        if _SESSION is not None:
+            return _SESSION
+        
+        import requests
+        import urllib3
+        import urllib3.poolmanager
+        
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=16,
+            max_retries=urllib3.Retry(total=2, backoff_factor=0.2, status_forcelist=[502, 503, 504])
+        )
+        # Streamed uploads are read from the encoder one block at a time, and
+        # the default 16 KiB block makes a large file cost hundreds of
+        # thousands of reads and progress callbacks. urllib3 1.x has no
+        # blocksize pool key and rejects every request that passes one.
+        if 'key_blocksize' in urllib3.poolmanager.PoolKey._fields:
+            adapter.poolmanager.connection_pool_kw['blocksize'] = UPLOAD_BLOCK_SIZE
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        _SESSION = session
+    
+    return _SESSION
+
+def server_request(endpoint, method="GET", data=None, files=None, token=None, progress_callback=None, params=None, quiet=False):
+    """Make a request to the server
+    
+    Requests made in the background pass quiet, so nothing they print lands
+    in the middle of the foreground output.
+    """
+    import requests
+    
+    session = get_session()
     url = f"{SERVER_URL}/{endpoint}"
     headers = {}
     
     if token:
         headers["Authorization"] = f"Bearer {token}"
         # Debug token issues
-        if endpoint.startswith("messages/") or endpoint.startswith("user/"):
+        if not quiet and (endpoint.startswith("messages/") or endpoint.startswith("user/")):
             console.print(f"[dim]Using token: {token[:10]}...[/dim]")
     
+    if method not in ("GET", "POST", "PUT", "DELETE"):
+        console.print(f"[bold red]Invalid method: {method}[/bold red]")
+        return None
+    
     try:
-        if method == "GET":
-            response = requests.get(url, headers=headers, timeout=10)
-        elif method == "POST":
-            if files:
-                response = requests.post(url, headers=headers, data=data, files=files, timeout=30)
-            else:
-                response = requests.post(url, headers=headers, json=data, timeout=10)
-        elif method == "PUT":
-            response = requests.put(url, headers=headers, json=data, timeout=10)
-        elif method == "DELETE":
-            response = requests.delete(url, headers=headers, timeout=10)
+        if files:
+            from requests_toolbelt import MultipartEncoder, MultipartEncoderMonitor
+            
+            # Stream the multipart body from the file instead of building it in memory
+            body = MultipartEncoder(fields={**(data or {}), **files})
+            if progress_callback:
+                body = MultipartEncoderMonitor(body, progress_callback)
+            headers["Content-Type"] = body.content_type
+            response = session.request(method, url, headers=headers, params=params, data=body, timeout=(3, 30))
         else:
-            console.print(f"[bold red]Invalid method: {method}[/bold red]")
-            return None
+            response = session.request(method, url, headers=headers, params=params, json=data, timeout=(3, 10))
         
         # Check if the response is JSON
         try:
@@ -148,13 +257,16 @@ def server_request(endpoint, method="GET", data=None, files=None, token=None, pr
             except:
                 return {"error": "Could not parse server response"}
     except requests.exceptions.ConnectionError:
-        console.print("[bold red]Could not connect to the server. Please check your internet connection.[/bold red]")
+        if not quiet:
+            console.print("[bold red]Could not connect to the server. Please check your internet connection.[/bold red]")
         return None
     except requests.exceptions.Timeout:
-        console.print("[bold red]The server took too long to respond. Please try again later.[/bold red]")
+        if not quiet:
+            console.print("[bold red]The server took too long to respond. Please try again later.[/bold red]")
         return None
     except Exception as e:
-        console.print(f"[bold red]An error occurred: {str(e)}[/bold red]")
+        if not quiet:
+            console.print(f"[bold red]An error occurred: {str(e)}[/bold red]")
         return None
 
 def get_server_token():
@@ -221,16 +333,13 @@ def get_users():
             return users
         else:
             # Fallback to local if server fails
-            with open(USERS_FILE, 'r') as f:
-                return json.load(f)
+            return read_json_file(USERS_FILE)
     else:
-        with open(USERS_FILE, 'r') as f:
-            return json.load(f)
+        return read_json_file(USERS_FILE)
 
 def save_users(users):
     if not USE_SERVER:
-        with open(USERS_FILE, 'w') as f:
-            json.dump(users, f)
+        write_json_file(USERS_FILE, users)
 
 def get_current_user():
     """Get the current logged in user"""
@@ -335,6 +444,7 @@ def delete_account():
             save_users(users)
             
             # Delete user's messages
+            _USER_MESSAGE_DIRS.pop(current_user, None)
             user_messages_dir = os.path.join(MESSAGES_DIR, current_user)
             if os.path.exists(user_messages_dir):
                 shutil.rmtree(user_messages_dir)
@@ -352,6 +462,68 @@ def delete_account():
     return False
 
 # Blocked users functions
+def load_blocked():
+    """Get the local blocked users data, re-reading the file only when it has changed"""
+    try:
+        mtime = os.stat(BLOCKED_FILE).st_mtime_ns
+    except FileNotFoundError:
+        return {}
+    
+    if _BLOCKED_CACHE['mtime'] != mtime:
+        blocked_data = read_json_file(BLOCKED_FILE)
+        # The file starts out as an empty list
+        _BLOCKED_CACHE['data'] = blocked_data if isinstance(blocked_data, dict) else {}
+        _BLOCKED_CACHE['mtime'] = mtime
+    
+    return _BLOCKED_CACHE['data']
+
+def lock_file(f):
+    """Wait for an exclusive lock on an open file"""
+    if os.name == 'nt':
+        import msvcrt
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+    else:
+        import fcntl
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+
+def unlock_file(f):
+    """Release a lock taken with lock_file"""
+    if os.name == 'nt':
+        import msvcrt
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+    else:
+        import fcntl
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+def update_blocked(mutate):
+    """Change the local blocked users data in one locked read-modify-write
+    
+    mutate is called with the parsed data and changes it in place. The file is
+    only rewritten if mutate returns a true value, which is also returned.
+    """
+    fd = os.open(BLOCKED_FILE, os.O_RDWR | os.O_CREAT, 0o600)
+    with os.fdopen(fd, 'r+b') as f:
+        lock_file(f)
+        try:
+            f.seek(0)
+            blocked_data = json_loads(f.read() or b'{}')
+            # The file starts out as an empty list
+            if not isinstance(blocked_data, dict):
+                blocked_data = {}
+            
+            changed = mutate(blocked_data)
+            if changed:
+                f.seek(0)
+                f.truncate()
+                f.write(json_dumps(blocked_data))
+                f.flush()
+        finally:
+            unlock_file(f)
+    
+    return changed
+
 def get_blocked_users():
     current_user = get_current_user()
     if not current_user:
@@ -365,8 +537,7 @@ def get_blocked_users():
                 return blocked
     
     # Fallback to local if server fails or not using server
-    with open(BLOCKED_FILE, 'r') as f:
-        blocked_data = json.load(f)
+    blocked_data = load_blocked()
     return blocked_data.get(current_user, [])
 
 def block_user(username):
@@ -378,6 +549,8 @@ def block_user(username):
     if current_user == username:
         console.print("[bold red]You cannot block yourself![/bold red]")
         return False
+    
+    forget_block_checks(username)
         
     if USE_SERVER:
         token = get_server_token()
@@ -392,21 +565,17 @@ def block_user(username):
                 return False
     
     # Fallback to local if server fails or not using server
-    with open(BLOCKED_FILE, 'r') as f:
-        blocked_data = json.load(f)
+    def add_block(blocked_data):
+        blocked = blocked_data.setdefault(current_user, [])
+        if username in blocked:
+            return False
+        blocked.append(username)
+        return True
     
-    if current_user not in blocked_data:
-        blocked_data[current_user] = []
-        
-    if username in blocked_data[current_user]:
+    if not update_blocked(add_block):
         console.print(f"[bold yellow]User {username} is already blocked.[/bold yellow]")
         return True
         
-    blocked_data[current_user].append(username)
-    
-    with open(BLOCKED_FILE, 'w') as f:
-        json.dump(blocked_data, f)
-        
     console.print(f"[bold green]User {username} has been blocked.[/bold green]")
     return True
 
@@ -415,6 +584,8 @@ def unblock_user(username):
     if not current_user:
         console.print("[bold red]You are not logged in![/bold red]")
         return False
+    
+    forget_block_checks(username)
         
     if USE_SERVER:
         token = get_server_token()
@@ -428,23 +599,38 @@ def unblock_user(username):
                 return False
     
     # Fallback to local if server fails or not using server
-    with open(BLOCKED_FILE, 'r') as f:
-        blocked_data = json.load(f)
+    def remove_block(blocked_data):
+        if username not in blocked_data.get(current_user, []):
+            return False
+        blocked_data[current_user].remove(username)
+        return True
     
-    if current_user not in blocked_data or username not in blocked_data[current_user]:
+    if not update_blocked(remove_block):
         console.print(f"[bold yellow]User {username} is not blocked.[/bold yellow]")
         return False
         
-    blocked_data[current_user].remove(username)
-    
-    with open(BLOCKED_FILE, 'w') as f:
-        json.dump(blocked_data, f)
-        
     console.print(f"[bold green]User {username} has been unblocked.[/bold green]")
     return True
 
 def is_blocked(sender, recipient):
-    """Check if a user is blocked"""
+    """Check if a user is blocked, reusing results younger than BLOCK_CHECK_TTL"""
+    key = (sender, recipient)
+    now = time.monotonic()
+    cached = _BLOCK_CHECK_CACHE.get(key)
+    if cached and now - cached[0] < BLOCK_CHECK_TTL:
+        return cached[1]
+    
+    result = lookup_blocked(sender, recipient)
+    _BLOCK_CHECK_CACHE[key] = (now, result)
+    return result
+
+def forget_block_checks(username):
+    """Drop cached block check results involving a user"""
+    for key in [key for key in _BLOCK_CHECK_CACHE if username in key]:
+        del _BLOCK_CHECK_CACHE[key]
+
+def lookup_blocked(sender, recipient):
+    """Ask the server, or the local blocked file, whether a user is blocked"""
     if USE_SERVER:
         token = get_server_token()
         if token:
@@ -457,16 +643,53 @@ def is_blocked(sender, recipient):
                 pass
     
     # Fallback to local if server fails or not using server
-    with open(BLOCKED_FILE, 'r') as f:
-        blocked_data = json.load(f)
+    blocked_data = load_blocked()
     return (recipient in blocked_data.get(sender, []) or 
             sender in blocked_data.get(recipient, []))
 
 # Message management functions
+def get_user_messages_dir(username):
+    """Get a user's local message directory, creating it on first use"""
+    user_messages_dir = _USER_MESSAGE_DIRS.get(username)
+    if user_messages_dir is None:
+        user_messages_dir = os.path.join(MESSAGES_DIR, username)
+        os.makedirs(user_messages_dir, exist_ok=True)
+        _USER_MESSAGE_DIRS[username] = user_messages_dir
+    return user_messages_dir
+
 def get_message_file(sender, recipient):
-    # Ensure the directory exists
-    os.makedirs(os.path.join(MESSAGES_DIR, sender), exist_ok=True)
-    return os.path.join(MESSAGES_DIR, sender, f"{recipient}.json")
+    message_file = os.path.join(get_user_messages_dir(sender), f"{recipient}.jsonl")
+    
+    # Convert a message file from the old format, a single JSON list, on first access
+    legacy_file = message_file[:-1]
+    try:
+        messages = read_json_file(legacy_file)
+    except FileNotFoundError:
+        return message_file
+    
+    if os.path.exists(message_file):
+        messages += read_message_file(message_file)
+    write_message_file(message_file, messages)
+    os.remove(legacy_file)
+    
+    return message_file
+
+def read_message_file(message_file):
+    """Read a local message file, which holds one JSON message per line"""
+    with open(message_file, 'rb') as f:
+        return [json_loads(line) for line in f if line.strip()]
+
+def write_message_file(message_file, messages):
+    """Replace the contents of a local message file"""
+    _MESSAGES_CACHE.pop(message_file, None)
+    with open(message_file, 'wb') as f:
+        f.write(b"".join(json_dumps(message) + b"\n" for message in messages))
+
+def append_message_file(message_file, message):
+    """Add a message to the end of a local message file without rewriting it"""
+    _MESSAGES_CACHE.pop(message_file, None)
+    with open(message_file, 'ab') as f:
+        f.write(json_dumps(message) + b"\n")
 
 def get_messages(sender, recipient):
     if USE_SERVER:
@@ -479,17 +702,139 @@ def get_messages(sender, recipient):
     # Fallback to local if server fails or not using server
     messages_file = get_message_file(sender, recipient)
     
-    if not os.path.exists(messages_file):
+    try:
+        mtime = os.stat(messages_file).st_mtime_ns
+    except FileNotFoundError:
         return []
     
-    with open(messages_file, 'r') as f:
-        return json.load(f)
+    # Only re-parse the file when it has changed since the last read
+    cached = _MESSAGES_CACHE.get(messages_file)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    
+    messages = read_message_file(messages_file)
+    _MESSAGES_CACHE[messages_file] = (mtime, messages)
+    return messages
+
+def count_pages(total):
+    """Get the number of pages needed to show total messages"""
+    return max(1, (total + MESSAGES_PER_PAGE - 1) // MESSAGES_PER_PAGE)
+
+def fetch_message_page(recipient, page=None, quiet=False):
+    """Fetch one page of a conversation from the server
+    
+    Without a page number the last page is fetched. Returns the page's
+    messages and the total number of messages, or None if the request failed.
+    Prefetches pass quiet so they print nothing over the chat screen.
+    """
+    if page is None:
+        params = {'offset': -MESSAGES_PER_PAGE, 'limit': MESSAGES_PER_PAGE}
+    else:
+        params = {'offset': (page - 1) * MESSAGES_PER_PAGE, 'limit': MESSAGES_PER_PAGE}
+    
+    result = server_request(f"messages/{recipient}", token=get_server_token(), params=params, quiet=quiet)
+    if not isinstance(result, dict) or not isinstance(result.get('messages'), list):
+        return None
+    
+    messages = result['messages']
+    total = result.get('total', 0)
+    
+    if page is None:
+        # The newest messages can reach back into the page before the last one
+        last_page_size = total - (count_pages(total) - 1) * MESSAGES_PER_PAGE
+        messages = messages[len(messages) - last_page_size:] if last_page_size > 0 else []
+    
+    return messages, total
+
+def get_message_page(recipient, page=None):
+    """Get one page of a conversation and prefetch the pages on either side of it
+    
+    Without a page number the last page is fetched. Returns the page's
+    messages, the page number and the number of pages, or None if the request
+    failed.
+    """
+    global _PAGE_PREFETCHER
+    
+    future = _PAGE_CACHE.pop((recipient, page), None)
+    result = future.result() if future else None
+    if result is None:
+        # A failed prefetch printed nothing, so fetch again to report the error
+        future = None
+        result = fetch_message_page(recipient, page)
+        if result is None:
+            return None
+    
+    messages, total = result
+    total_pages = count_pages(total)
+    if page is None:
+        page = total_pages
+    if page == total_pages:
+        _LAST_PAGES[recipient] = messages
+    
+    # Keep the page so coming back to it doesn't fetch it again
+    if future is None:
+        from concurrent.futures import Future
+        future = Future()
+        future.set_result(result)
+    _PAGE_CACHE[(recipient, page)] = future
+    
+    # Fetch the neighbouring pages in the background so flipping to them is instant
+    if _PAGE_PREFETCHER is None:
+        from concurrent.futures import ThreadPoolExecutor
+        _PAGE_PREFETCHER = ThreadPoolExecutor(max_workers=1)
+    for neighbour in (page - 1, page + 1):
+        if 1 <= neighbour <= total_pages and (recipient, neighbour) not in _PAGE_CACHE:
+            _PAGE_CACHE[(recipient, neighbour)] = _PAGE_PREFETCHER.submit(
+                fetch_message_page, recipient, neighbour, quiet=True)
+    
+    # Drop the least recently used pages
+    while len(_PAGE_CACHE) > PAGE_CACHE_SIZE:
+        del _PAGE_CACHE[next(iter(_PAGE_CACHE))]
+    
+    return messages, page, total_pages
+
+def fetch_new_messages(recipient):
+    """Bring the last page of a conversation up to date
+    
+    Only the messages newer than the last one already seen are fetched.
+    Returns the last page's messages, the page number and the number of
+    pages, or None if the request failed.
+    """
+    last_page = _LAST_PAGES.get(recipient)
+    if not last_page or 'id' not in last_page[-1]:
+        return get_message_page(recipient)
+    
+    result = server_request(f"messages/{recipient}", token=get_server_token(),
+                            params={'after': last_page[-1]['id']})
+    if not isinstance(result, dict) or not isinstance(result.get('messages'), list):
+        return None
+    
+    total = result.get('total', 0)
+    total_pages = count_pages(total)
+    
+    # Never show a message twice, even if the server sends one already on the page
+    seen = {message.get('id') for message in last_page}
+    new_messages = [message for message in result['messages'] if message.get('id') not in seen]
+    
+    # The new messages can start a new page
+    last_page_size = total - (total_pages - 1) * MESSAGES_PER_PAGE
+    messages = (last_page + new_messages)[-last_page_size:] if last_page_size > 0 else []
+    _LAST_PAGES[recipient] = messages
+    
+    return messages, total_pages, total_pages
+
+def forget_message_pages(recipient):
+    """Drop the cached pages of a conversation, after it has changed"""
+    for key in [key for key in _PAGE_CACHE if key[0] == recipient]:
+        del _PAGE_CACHE[key]
 
 def save_messages(sender, recipient, messages):
     if not USE_SERVER:
-        message_file = get_message_file(sender, recipient)
-        with open(message_file, 'w') as f:
-            json.dump(messages, f)
+        write_message_file(get_message_file(sender, recipient), messages)
+
+def append_message(sender, recipient, message):
+    if not USE_SERVER:
+        append_message_file(get_message_file(sender, recipient), message)
 
 def get_all_chats(username):
     """Get a list of all users the current user has chatted with"""
@@ -501,15 +846,23 @@ def get_all_chats(username):
                 return chats
     
     # Fallback to local if server fails or not using server
-    user_messages_dir = os.path.join(MESSAGES_DIR, username)
-    if not os.path.exists(user_messages_dir):
+    try:
+        entries = os.scandir(os.path.join(MESSAGES_DIR, username))
+    except FileNotFoundError:
         return []
     
     chats = []
-    for filename in os.listdir(user_messages_dir):
-        if filename.endswith('.json'):
-            chat_user = filename[:-5]  # Remove .json extension
-            chats.append(chat_user)
+    with entries:
+        for entry in entries:
+            if not entry.is_file():
+                continue
+            if entry.name.endswith('.jsonl'):
+                chat_user = entry.name[:-6]  # Remove .jsonl extension
+                chats.append(chat_user)
+            elif entry.name.endswith('.json'):
+                # Not yet converted to the .jsonl format
+                chat_user = entry.name[:-5]  # Remove .json extension
+                chats.append(chat_user)
     
     return chats
 
@@ -590,23 +943,7 @@ def send_message(recipient, message_text):
             return False
     
     # Fallback to local if server fails or not using server
-    messages_dir = os.path.join(MESSAGES_DIR, current_user)
-    os.makedirs(messages_dir, exist_ok=True)
-    
-    message_file = os.path.join(messages_dir, f"{recipient}.json")
-    
-    messages = []
-    if os.path.exists(message_file):
-        try:
-            with open(message_file, 'r') as f:
-                messages = json.load(f)
-        except json.JSONDecodeError:
-            messages = []
-    
-    messages.append(message)
-    
-    with open(message_file, 'w') as f:
-        json.dump(messages, f, indent=2)
+    append_message_file(get_message_file(current_user, recipient), message)
     
     return True
 
@@ -632,26 +969,22 @@ def save_message(sender, recipient, message_text):
     
     # Fallback to local if server fails or not using server
     # Save message in sender's file
-    sender_messages = get_messages(sender, recipient)
-    sender_messages.append({
+    append_message(sender, recipient, {
         "sender": sender,
         "recipient": recipient,
         "message": message_text,
         "timestamp": datetime.now().isoformat(),
         "read": True
     })
-    save_messages(sender, recipient, sender_messages)
     
     # Save message in recipient's file
-    recipient_messages = get_messages(recipient, sender)
-    recipient_messages.append({
+    append_message(recipient, sender, {
         "sender": sender,
         "recipient": recipient,
         "message": message_text,
         "timestamp": datetime.now().isoformat(),
         "read": False
     })
-    save_messages(recipient, sender, recipient_messages)
     
     console.print(f"[bold green]Message sent to {recipient}![/bold green]")
     return True
@@ -675,38 +1008,14 @@ def send_file(sender, recipient, file_path):
     if USE_SERVER:
         token = get_server_token()
         if token:
-            with open(file_path, 'rb') as f:
-                files = {'file': (file_name, f)}
-                
-                # Show ASCII progress bar
-                console.print(f"[bold cyan]Uploading {file_name} to {recipient}...[/bold cyan]")
-                
-                # Create a custom progress bar
-                total_size = os.path.getsize(file_path)
-                uploaded = 0
-                bar_length = 40
-                
-                def progress_callback(monitor):
-                    nonlocal uploaded
-                    uploaded = monitor.bytes_read
-                    progress = min(1.0, uploaded / total_size)
-                    bar = "█" * int(bar_length * progress) + "░" * (bar_length - int(bar_length * progress))
-                    percent = int(progress * 100)
-                    console.print(f"\r[{bar}] {percent}% ({format_size(uploaded)}/{format_size(total_size)})", end="")
-                
-                # Use a custom adapter with progress tracking
-                result = server_request(f"files/{recipient}", method="POST", 
-                                      files=files, token=token, 
-                                      progress_callback=progress_callback)
-                
-                console.print()  # New line after progress bar
-                
-                if result and result.get("success"):
-                    console.print(f"[bold green]File {file_name} sent to {recipient}![/bold green]")
-                    return True
-                else:
-                    console.print(f"[bold red]Failed to send file to {recipient}![/bold red]")
-                    return False
+            result = upload_file(recipient, file_path, file_size, token)
+            
+            if result and result.get("success"):
+                console.print(f"[bold green]File {file_name} sent to {recipient}![/bold green]")
+                return True
+            else:
+                console.print(f"[bold red]Failed to send file to {recipient}![/bold red]")
+                return False
     
     # Fallback to local if server fails or not using server
     # Copy file to recipient's directory
@@ -714,28 +1023,10 @@ def send_file(sender, recipient, file_path):
     recipient_file_path = os.path.join(FILES_DIR, recipient, file_name)
     
     try:
-        # Show ASCII progress bar for local copy
-        console.print(f"[bold cyan]Copying {file_name} to {recipient}...[/bold cyan]")
-        
-        total_size = os.path.getsize(file_path)
-        copied = 0
-        bar_length = 40
-        
-        with open(file_path, 'rb') as src, open(recipient_file_path, 'wb') as dst:
-            while True:
-                buf = src.read(1024 * 1024)  # 1MB chunks
-                if not buf:
-                    break
-                dst.write(buf)
-                copied += len(buf)
-                
-                # Update progress bar
-                progress = min(1.0, copied / total_size)
-                bar = "█" * int(bar_length * progress) + "░" * (bar_length - int(bar_length * progress))
-                percent = int(progress * 100)
-                console.print(f"\r[{bar}] {percent}% ({format_size(copied)}/{format_size(total_size)})", end="")
-        
-        console.print()  # New line after progress bar
+        with transfer_progress() as progress:
+            task = progress.add_task(f"Copying {file_name} to {recipient}", total=file_size)
+            copy_file(file_path, recipient_file_path,
+                      lambda copied: progress.update(task, advance=copied))
     except Exception as e:
         console.print(f"[bold red]Failed to copy file: {str(e)}[/bold red]")
         return False
@@ -746,74 +1037,86 @@ def send_file(sender, recipient, file_path):
     console.print(f"[bold green]File sent successfully to {recipient}![/bold green]")
     return True
 
-def format_size(size):
-    """Format file size in human-readable format"""
-    for unit in ['B', 'KB', 'MB', 'GB', 'TB']:
-        if size < 1024.0:
-            return f"{size:.2f} {unit}"
-        size /= 1024.0
-    return f"{size:.2f} PB"
-
-def display_messages(username, messages, page, total_pages):
-    """Display messages with pagination"""
-    console.clear()
-    console.print(f"[bold cyan]Chat with {username} (Page {page}/{total_pages})[/bold cyan]")
-    console.print("[bold cyan]Type '~' to exit, 'p' for previous page, 'n' for next page[/bold cyan]")
-    console.print()
-    
-    # If messages is empty, return early
-    if not messages:
-        return
-    
-    # Calculate the slice of messages to display
-    start_idx = (page - 1) * MESSAGES_PER_PAGE
-    end_idx = min(start_idx + MESSAGES_PER_PAGE, len(messages))
+def upload_file(recipient, file_path, file_size, token):
+    """Upload a file to a user, streaming it from disk
     
-    # Get the messages for this page
-    page_messages = messages[start_idx:end_idx]
+    Files under PROGRESS_MIN_SIZE are sent in a moment, so they skip the
+    live progress display and its refresh thread.
+    """
+    file_name = os.path.basename(file_path)
     
-    # Display the messages
-    for message in page_messages:
-        if not isinstance(message, dict):
-            continue
-            
-        sender = message.get('sender', '')
-        content = message.get('content', '')
-        timestamp = message.get('timestamp', '')
-        is_file = message.get('is_file', False)
-        
-        # Format the timestamp
-        try:
-            dt = datetime.fromisoformat(timestamp)
-            formatted_time = dt.strftime("%Y-%m-%d %H:%M:%S")
-        except:
-            formatted_time = timestamp
+    with open(file_path, 'rb') as f:
+        files = {'file': (file_name, f, 'application/octet-stream')}
         
-        # Determine the style based on the sender
-        if sender == get_current_user():
-            sender_style = "green"
-            align = "right"
-        else:
-            sender_style = "blue"
-            align = "left"
+        if file_size < PROGRESS_MIN_SIZE:
+            console.print(f"[cyan]Uploading {file_name}...[/cyan]")
+            return server_request(f"files/{recipient}", method="POST", files=files, token=token)
         
-        # Create the message text
-        if is_file:
-            message_text = Text(f"📎 {content} (File)")
-        else:
-            message_text = Text(content)
+        with transfer_progress() as progress:
+            task = progress.add_task(f"Uploading {file_name} to {recipient}", total=file_size)
+            
+            def progress_callback(monitor):
+                # bytes_read includes the multipart headers around the file
+                progress.update(task, completed=min(monitor.bytes_read, file_size))
+            
+            return server_request(f"files/{recipient}", method="POST", files=files, token=token,
+                                  progress_callback=progress_callback)
+
+def copy_file(src_path, dst_path, progress_callback=None):
+    """Copy a file, calling progress_callback with the size of each copied chunk
+    
+    Uses os.sendfile where the platform supports file-to-file copies so the data
+    stays in the kernel, and falls back to a buffered copy otherwise.
+    """
+    with open(src_path, 'rb') as src, open(dst_path, 'wb') as dst:
+        offset = 0
+        if hasattr(os, 'sendfile'):
+            try:
+                while True:
+                    sent = os.sendfile(dst.fileno(), src.fileno(), offset, COPY_CHUNK_SIZE)
+                    if not sent:
+                        return
+                    offset += sent
+                    if progress_callback:
+                        progress_callback(sent)
+            except OSError:
+                # macOS only sends to sockets, so retry with a normal copy
+                if offset:
+                    raise
         
-        # Create the panel
-        panel = Panel(
-            message_text,
-            title=f"[{sender_style}]{sender}[/{sender_style}] - {formatted_time}",
-            border_style=sender_style
-        )
+        if not progress_callback:
+            shutil.copyfileobj(src, dst, COPY_CHUNK_SIZE)
+            return
         
-        # Print the panel
-        console.print(panel, justify=align)
+        while True:
+            buf = src.read(COPY_CHUNK_SIZE)
+            if not buf:
+                break
+            dst.write(buf)
+            progress_callback(len(buf))
+
+def transfer_progress():
+    """Create a progress display for a file transfer
     
-    console.print()
+    Progress redraws at a fixed rate, so updating it for every chunk is cheap.
+    """
+    from rich.progress import Progress, TextColumn, BarColumn, DownloadColumn, TransferSpeedColumn
+    
+    return Progress(
+        TextColumn("[bold cyan]{task.description}"),
+        BarColumn(),
+        DownloadColumn(),
+        TransferSpeedColumn(),
+        console=get_console()
+    )
+
+@lru_cache(maxsize=4096)
+def format_timestamp(timestamp, time_format="%Y-%m-%d %H:%M:%S"):
+    """Format an ISO timestamp for display, remembering recent results"""
+    try:
+        return datetime.fromisoformat(timestamp).strftime(time_format)
+    except (TypeError, ValueError):
+        return timestamp
 
 # Command handlers
 def handle_signup(args):
@@ -842,8 +1145,11 @@ def handle_signup(args):
     if result and result.get('success'):
         console.print(f"[bold green]User {username} created successfully![/bold green]")
         
-        # Automatically log in
-        login_result = server_request("login", method="POST", data={"username": username, "password": password})
+        # The server logs new users in and returns their token, older servers
+        # need a separate login request
+        login_result = result
+        if not result.get('token'):
+            login_result = server_request("login", method="POST", data={"username": username, "password": password})
         
         if login_result and login_result.get('success'):
             # Save the token
@@ -943,25 +1249,34 @@ def handle_message(args):
     if hasattr(args, 'page') and args.page and args.page.isdigit():
         page = int(args.page)
     
-    # Get the messages
-    token = get_server_token()
-    result = server_request(f"messages/{username}", token=token)
+    # Check that the user exists while the page is fetched, so the two
+    # requests overlap on separate pooled connections
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        exists = executor.submit(user_exists, username)
+        
+        # Get only the requested page of messages
+        result = get_message_page(username, page)
+        exists = exists.result()
     
     messages = []
-    if result and isinstance(result, list):
-        messages = result
-    
-    # Calculate pagination
-    total_pages = max(1, (len(messages) + MESSAGES_PER_PAGE - 1) // MESSAGES_PER_PAGE)
+    total_pages = 1
+    if result:
+        messages, page, total_pages = result
     
     if page > total_pages:
-        page = total_pages
+        # Past the end, show the last page instead
+        result = get_message_page(username)
+        if result:
+            messages, page, total_pages = result
+        else:
+            page = total_pages
     
     # Display the messages
-    display_messages(username, messages, page, total_pages)
+    display_message_page(username, messages, page, total_pages)
     
     # Enter chat mode
-    chat_mode(username)
+    chat_mode(username, page, exists)
 
 def handle_send(args):
     """Handle the send command"""
@@ -971,7 +1286,7 @@ def handle_send(args):
     
     # Get the username and file path
     username = args.username
-    file_path = args.file
+    file_path = args.file_path
     
     # Check if the file exists
     if not os.path.exists(file_path):
@@ -984,24 +1299,8 @@ def handle_send(args):
         console.print(f"[bold red]File is too large: {format_file_size(file_size)}. Maximum size is {format_file_size(MAX_FILE_SIZE)}.[/bold red]")
         return
     
-    # Send the file
-    with open(file_path, 'rb') as f:
-        file_data = f.read()
-    
-    token = get_server_token()
-    with Progress() as progress:
-        task = progress.add_task("[cyan]Uploading file...", total=100)
-        
-        # Create a files dictionary for the request
-        files = {
-            'file': (os.path.basename(file_path), file_data, 'application/octet-stream')
-        }
-        
-        # Send the file
-        result = server_request(f"files/{username}", method="POST", token=token, files=files)
-        
-        # Update progress
-        progress.update(task, completed=100)
+    # Send the file, streaming it from disk instead of reading it into memory
+    result = upload_file(username, file_path, file_size, get_server_token())
     
     if result and result.get('success'):
         console.print(f"[bold green]File sent to {username} successfully![/bold green]")
@@ -1010,25 +1309,23 @@ def handle_send(args):
         console.print(f"[bold red]Failed to send file: {error_message}[/bold red]")
 
 # Display messages
-def display_messages(username, messages, page, total_pages):
-    """Display messages with pagination"""
-    console.clear()
-    console.print(f"[bold cyan]Chat with {username} (Page {page}/{total_pages})[/bold cyan]")
-    console.print("[bold cyan]Type '~' to exit, 'p' for previous page, 'n' for next page[/bold cyan]")
-    console.print()
-    
-    # If messages is empty, return early
-    if not messages:
-        return
+def display_message_page(username, page_messages, page, total_pages):
+    """Display one page of messages"""
+    from rich.align import Align
+    from rich.console import Group
+    from rich.panel import Panel
+    from rich.text import Text
     
-    # Calculate the slice of messages to display
-    start_idx = (page - 1) * MESSAGES_PER_PAGE
-    end_idx = min(start_idx + MESSAGES_PER_PAGE, len(messages))
+    console.clear()
     
-    # Get the messages for this page
-    page_messages = messages[start_idx:end_idx]
+    # Build the header and every panel first and print the page in one go
+    lines = [
+        f"[bold cyan]Chat with {username} (Page {page}/{total_pages})[/bold cyan]",
+        "[bold cyan]Type '~' to exit, 'p' for previous page, 'n' for next page[/bold cyan]",
+        ""
+    ]
     
-    # Display the messages
+    current_user = get_current_user()
     for message in page_messages:
         if not isinstance(message, dict):
             continue
@@ -1039,14 +1336,10 @@ def display_messages(username, messages, page, total_pages):
         is_file = message.get('is_file', False)
         
         # Format the timestamp
-        try:
-            dt = datetime.fromisoformat(timestamp)
-            formatted_time = dt.strftime("%Y-%m-%d %H:%M:%S")
-        except:
-            formatted_time = timestamp
+        formatted_time = format_timestamp(timestamp)
         
         # Determine the style based on the sender
-        if sender == get_current_user():
+        if sender == current_user:
             sender_style = "green"
             align = "right"
         else:
@@ -1066,14 +1359,20 @@ def display_messages(username, messages, page, total_pages):
             border_style=sender_style
         )
         
-        # Print the panel
-        console.print(panel, justify=align)
+        lines.append(Align(panel, align))
+    
+    if page_messages:
+        lines.append("")
     
-    console.print()
+    console.print(Group(*lines))
 
 # Chat mode
-def chat_mode(username):
-    """Enter chat mode with a user"""
+def chat_mode(username, page=None, exists=None):
+    """Enter chat mode with a user
+    
+    Args:
+        exists: Result of a user_exists check the caller already made for username
+    """
     # Get current user
     current_user = get_current_user()
     
@@ -1082,7 +1381,7 @@ def chat_mode(username):
     if is_self_chat:
         console.print(f"[bold yellow]You are now chatting with yourself ({username})[/bold yellow]")
     # Verify other users exist before starting chat
-    elif not user_exists(username):
+    elif not (user_exists(username) if exists is None else exists):
         console.print(f"[bold red]User {username} does not exist.[/bold red]")
         return
     
@@ -1100,22 +1399,27 @@ def chat_mode(username):
         if message == "~":
             # Exit chat mode
             break
-        elif message == "p":
-            # Previous page
-            # This would need to be implemented with state tracking
-            console.print("[bold yellow]Previous page navigation not implemented in this version.[/bold yellow]")
-            continue
-        elif message == "n":
-            # Next page
-            # This would need to be implemented with state tracking
-            console.print("[bold yellow]Next page navigation not implemented in this version.[/bold yellow]")
+        elif message in ("p", "n"):
+            # Previous or next page, starting from the last page
+            if page is None:
+                result = get_message_page(username)
+                page = result[1] if result else 1
+            
+            target = page - 1 if message == "p" else page + 1
+            result = get_message_page(username, target) if target >= 1 else None
+            if result and result[0]:
+                messages, page, total_pages = result
+                display_message_page(username, messages, page, total_pages)
+            else:
+                console.print("[bold yellow]No more messages in that direction.[/bold yellow]")
             continue
         
         # Send the message
         if message:
-            # Get a fresh token for each message
-            # Skip validation for self-messaging to avoid server issues
-            token = get_fresh_token(skip_validation=is_self_chat)
+            # The token was validated when the chat started, and an expired
+            # one is caught by the send below, so don't spend a round trip
+            # re-validating it for every message
+            token = get_fresh_token(skip_validation=True)
             if not token:
                 break  # get_fresh_token already displays appropriate messages
                 
@@ -1132,16 +1436,13 @@ def chat_mode(username):
             result = server_request(f"messages/{username}", method="POST", token=token, data=message_data)
             
             if result and result.get('success'):
-                # Refresh the messages
-                messages = server_request(f"messages/{username}", token=token)
+                # Refresh the last page of messages, fetching only what is new
+                forget_message_pages(username)
+                result = fetch_new_messages(username)
                 
-                if messages and isinstance(messages, list):
-                    # Display the last page of messages
-                    total_pages = (len(messages) + MESSAGES_PER_PAGE - 1) // MESSAGES_PER_PAGE
-                    if total_pages == 0:
-                        total_pages = 1
-                    
-                    display_messages(username, messages, total_pages, total_pages)
+                if result and result[0]:
+                    messages, page, total_pages = result
+                    display_message_page(username, messages, page, total_pages)
                 else:
                     console.print("[bold yellow]No messages to display.[/bold yellow]")
             else:
@@ -1171,6 +1472,8 @@ def format_file_size(size_bytes):
 
 def handle_about(args):
     """Display information about TerminalChat"""
+    from rich.panel import Panel
+    
     logo = """
     ████████╗███████╗██████╗ ███╗   ███╗██╗███╗   ██╗ █████╗ ██╗      ██████╗██╗  ██╗ █████╗ ████████╗
     ╚══██╔══╝██╔════╝██╔══██╗████╗ ████║██║████╗  ██║██╔══██╗██║     ██╔════╝██║  ██║██╔══██╗╚══██╔══╝
@@ -1202,6 +1505,8 @@ def handle_about(args):
 
 def handle_status(args):
     """Display the current status of TerminalChat"""
+    from rich.panel import Panel
+    
     clear_terminal()
     
     current_user = get_current_user()
@@ -1216,11 +1521,14 @@ def handle_status(args):
     if current_user:
         new_messages = check_for_new_messages()
         if new_messages:
-            status_text += f"\n[bold]New Messages:[/bold] {len(new_messages)}"
+            status_text += f"\n[bold]New Messages:[/bold] {new_messages}"
     
     console.print(Panel(status_text, title="TerminalChat Status", border_style="cyan"))
 
 def handle_chat_list(args):
+    from rich import box
+    from rich.table import Table
+    
     current_user = get_current_user()
     
     if not current_user:
@@ -1228,11 +1536,8 @@ def handle_chat_list(args):
         console.print("[bold red]You are not logged in! Please login first.[/bold red]")
         return
     
-    # Get all message files
-    user_messages_dir = os.path.join(MESSAGES_DIR, current_user)
-    
-    if not os.path.exists(user_messages_dir):
-        os.makedirs(user_messages_dir, exist_ok=True)
+    # Make sure the user has a message directory
+    user_messages_dir = get_user_messages_dir(current_user)
     
     chats = []
     
@@ -1245,19 +1550,12 @@ def handle_chat_list(args):
     
     # Fallback to local if server fails or not using server
     if not chats:
-        message_files = []
-        for filename in os.listdir(MESSAGES_DIR):
-            if filename.endswith('.json'):
-                parts = filename.split('_')
-                if len(parts) >= 2:
-                    user1 = parts[0]
-                    user2 = parts[1].split('.')[0]
-                    
-                    if user1 == current_user or user2 == current_user:
-                        other_user = user2 if user1 == current_user else user1
-                        message_files.append((other_user, filename))
+        # Each chat is a {other_user}.jsonl file, or a .json file in the old format
+        with os.scandir(user_messages_dir) as entries:
+            chat_users = {entry.name.rsplit('.', 1)[0] for entry in entries
+                          if entry.name.endswith(('.jsonl', '.json')) and entry.is_file()}
         
-        for other_user, _ in message_files:
+        for other_user in chat_users:
             messages = get_messages(current_user, other_user)
             
             if messages:
@@ -1265,13 +1563,9 @@ def handle_chat_list(args):
                 last_message_text = last_message.get("content", "")
                 timestamp = last_message.get("timestamp", "")
                 
-                try:
-                    formatted_time = datetime.fromisoformat(timestamp).strftime("%Y-%m-%d %H:%M")
-                except:
-                    formatted_time = timestamp
-                
-                # Check if there are unread messages
-                has_unread = has_unread_messages(other_user)
+                # Count unread messages from the messages already loaded
+                has_unread = sum(1 for message in messages
+                                 if message.get("sender") == other_user and not message.get("read", False))
                 
                 # Check if the last message is a file
                 is_file = last_message.get("is_file", False)
@@ -1279,7 +1573,7 @@ def handle_chat_list(args):
                 chats.append({
                     "username": other_user,
                     "last_message": last_message_text,
-                    "timestamp": formatted_time,
+                    "timestamp": timestamp,
                     "unread": has_unread,
                     "is_file": is_file
                 })
@@ -1289,7 +1583,7 @@ def handle_chat_list(args):
         console.print("[bold yellow]You have no active chats.[/bold yellow]")
         return
     
-    table = Table(title="Your Chats", box=rich.box.ROUNDED)
+    table = Table(title="Your Chats", box=box.ROUNDED)
     table.add_column("Username", style="cyan")
     table.add_column("Last Message", style="white")
     table.add_column("Time", style="green")
@@ -1298,7 +1592,7 @@ def handle_chat_list(args):
     for chat in sorted(chats, key=lambda x: x.get("timestamp", ""), reverse=True):
         username = chat.get("username", "")
         last_message = chat.get("last_message", "")
-        timestamp = chat.get("timestamp", "")
+        timestamp = format_timestamp(chat.get("timestamp", ""), "%Y-%m-%d %H:%M")
         has_unread = chat.get("unread", 0)
         
         # Format the last message
@@ -1373,6 +1667,9 @@ def handle_unblock(args):
     unblock_user(username)
 
 def handle_list_blocked(args):
+    from rich import box
+    from rich.table import Table
+    
     clear_terminal()
     current_user = get_current_user()
     
@@ -1386,7 +1683,7 @@ def handle_list_blocked(args):
         console.print("[bold yellow]You have not blocked any users.[/bold yellow]")
         return
     
-    table = Table(title="Blocked Users", box=rich.box.ROUNDED)
+    table = Table(title="Blocked Users", box=box.ROUNDED)
     table.add_column("Username", style="red")
     
     for user in blocked_users:
@@ -1413,6 +1710,11 @@ def handle_uninstall(args):
     console.print("[bold green]TerminalChat has been uninstalled from your system.[/bold green]")
     console.print("[bold yellow]Note: You may need to manually remove the terminalchat command from your PATH.[/bold yellow]")
 
+def handle_install(args):
+    """Handle the install command, which creates the tc command shortcut"""
+    if create_tc_symlink():
+        console.print("[bold green]The 'tc' command shortcut is set up.[/bold green]")
+
 def handle_update(args):
     """Update TerminalChat to the latest version"""
     console.print("[bold cyan]Checking for updates...[/bold cyan]")
@@ -1441,6 +1743,7 @@ def handle_update(args):
                     os.makedirs(temp_dir, exist_ok=True)
                     
                     # Clone or pull the repository
+                    terminalchat_path = None
                     if shutil.which("git"):
                         # Use git if available
                         if os.path.exists(os.path.join(temp_dir, ".git")):
@@ -1449,28 +1752,33 @@ def handle_update(args):
                         else:
                             # Clone the repository
                             subprocess.run(["git", "clone", REPO_URL, temp_dir], check=True)
+                        
+                        # Find the terminalchat.py file
+                        for root, dirs, files in os.walk(temp_dir):
+                            if "terminalchat.py" in files:
+                                terminalchat_path = os.path.join(root, "terminalchat.py")
+                                break
                     else:
-                        # Download the zip file
+                        # Download the zip file into memory, it is only a few MB
                         zip_url = f"{REPO_URL}/archive/main.zip"
-                        zip_path = os.path.join(temp_dir, "terminalchat.zip")
                         
+                        import io
+                        import requests
+                        
+                        zip_data = io.BytesIO()
                         with requests.get(zip_url, stream=True) as r:
                             r.raise_for_status()
-                            with open(zip_path, 'wb') as f:
-                                for chunk in r.iter_content(chunk_size=8192):
-                                    f.write(chunk)
+                            for chunk in r.iter_content(chunk_size=1024 * 1024):
+                                zip_data.write(chunk)
                         
-                        # Extract the zip file
+                        # Extract only terminalchat.py, taking the copy nearest the top of the archive
                         import zipfile
-                        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-                            zip_ref.extractall(temp_dir)
-                    
-                    # Find the terminalchat.py file
-                    terminalchat_path = None
-                    for root, dirs, files in os.walk(temp_dir):
-                        if "terminalchat.py" in files:
-                            terminalchat_path = os.path.join(root, "terminalchat.py")
-                            break
+                        with zipfile.ZipFile(zip_data, 'r') as zip_ref:
+                            members = [name for name in zip_ref.namelist()
+                                       if name == "terminalchat.py" or name.endswith("/terminalchat.py")]
+                            if members:
+                                member = min(members, key=lambda name: name.count("/"))
+                                terminalchat_path = zip_ref.extract(member, temp_dir)
                     
                     if not terminalchat_path:
                         console.print("[bold red]Could not find terminalchat.py in the downloaded files![/bold red]")
@@ -1483,8 +1791,12 @@ def handle_update(args):
                     backup_path = current_script + ".backup"
                     shutil.copy2(current_script, backup_path)
                     
-                    # Replace the current script with the new one
-                    shutil.copy2(terminalchat_path, current_script)
+                    # Replace the current script with the new one in a single rename,
+                    # keeping the current script's permissions
+                    new_script = current_script + ".new"
+                    shutil.copyfile(terminalchat_path, new_script)
+                    shutil.copymode(current_script, new_script)
+                    os.replace(new_script, current_script)
                     
                     # Clean up
                     shutil.rmtree(temp_dir)
@@ -1536,30 +1848,47 @@ def handle_delete_account(args):
         clear_terminal()
         console.print(f"[bold red]Failed to delete account: {error_message}[/bold red]")
 
-def show_notification(message):
-    """Show a system notification"""
+def show_notification(message, quiet=False):
+    """Show a system notification
+    
+    The notifier is started without a shell and not waited for. The message
+    is passed as its own argument, so quotes in it can't break the command.
+    With quiet set there is no fallback to printing the message in the console.
+    """
+    global _TOASTER
+    
     try:
         # Check the operating system
         if sys.platform == "darwin":  # macOS
-            # Use osascript to show notification
-            os.system(f"""
-            osascript -e 'display notification "{message}" with title "TerminalChat"'
-            """)
+            # Use osascript to show notification, reading the message from argv
+            command = ["osascript",
+                       "-e", "on run argv",
+                       "-e", 'display notification (item 1 of argv) with title "TerminalChat"',
+                       "-e", "end run",
+                       message]
         elif sys.platform == "linux":
             # Use notify-send on Linux
-            os.system(f'notify-send "TerminalChat" "{message}"')
+            command = ["notify-send", "TerminalChat", message]
         elif sys.platform == "win32":
             # Use Windows toast notifications
             try:
-                from win10toast import ToastNotifier
-                toaster = ToastNotifier()
-                toaster.show_toast("TerminalChat", message, duration=5)
+                if _TOASTER is None:
+                    from win10toast import ToastNotifier
+                    _TOASTER = ToastNotifier()
+                _TOASTER.show_toast("TerminalChat", message, duration=5, threaded=True)
             except ImportError:
                 # Fall back to console notification
-                console.print(f"[bold cyan]NOTIFICATION:[/bold cyan] {message}")
+                if not quiet:
+                    console.print(f"[bold cyan]NOTIFICATION:[/bold cyan] {message}")
+            return
         else:
             # Fall back to console notification
-            console.print(f"[bold cyan]NOTIFICATION:[/bold cyan] {message}")
+            if not quiet:
+                console.print(f"[bold cyan]NOTIFICATION:[/bold cyan] {message}")
+            return
+        
+        subprocess.Popen(command, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                         stderr=subprocess.DEVNULL)
     except Exception as e:
         # Silently fail for notifications
         pass
@@ -1586,8 +1915,8 @@ def handle_file_received(sender, file_name, file_data=None, file_path=None):
             with open(target_path, 'wb') as f:
                 f.write(file_data)
         elif file_path:
-            # Copy file from source path
-            shutil.copy2(file_path, target_path)
+            # Copy file from source path, without its metadata, in the kernel where possible
+            copy_file(file_path, target_path)
         else:
             console.print("[bold red]No file data or path provided![/bold red]")
             return False
@@ -1606,46 +1935,76 @@ def has_unread_messages(username):
     if not current_user:
         return False
     
+    if USE_SERVER:
+        token = get_server_token()
+        if token:
+            # The chat list keeps an unread count per chat, so there is no need
+            # to download the conversation, which would also mark it read
+            chats = server_request("chats", token=token)
+            if isinstance(chats, list):
+                return any(chat.get('username') == username and chat.get('unread') for chat in chats)
+    
     messages = get_messages(current_user, username)
     
-    for message in messages:
+    # Unread messages are the newest ones, so start from the end
+    for message in reversed(messages):
         if message["sender"] == username and not message.get("read", False):
             return True
     
     return False
 
-def check_for_new_messages():
-    """Check for new messages from other users"""
+def check_for_new_messages(quiet=False):
+    """Check for new messages from other users and return the unread count
+    
+    The count is reused for NEW_MESSAGES_CHECK_TTL seconds, so a command that
+    checks again right after startup makes no second request and shows no
+    second notification. The check started at launch passes quiet, so it
+    prints nothing into the output or prompts of the command.
+    """
+    global _NEW_MESSAGES_CHECK
+    
     # Skip if not logged in
     if not is_logged_in():
-        return
+        return 0
     
-    try:
-        # Get the current user
-        current_user = get_current_user()
+    # Wait for a check that is already running and reuse its count
+    with _NEW_MESSAGES_LOCK:
+        if _NEW_MESSAGES_CHECK and time.monotonic() - _NEW_MESSAGES_CHECK[0] < NEW_MESSAGES_CHECK_TTL:
+            return _NEW_MESSAGES_CHECK[1]
         
-        # Get all chats
-        if USE_SERVER:
-            token = get_server_token()
-            if not token:
-                return
-            
-            # Get chats from server
-            chats = server_request("chats", token=token)
-            
-            # Count unread messages
-            unread_count = sum(chat.get('unread', 0) for chat in chats)
+        try:
+            # Get the current user
+            current_user = get_current_user()
             
-            # Show notification if there are unread messages
-            if unread_count > 0:
-                # Show system notification
-                show_notification(f"You have {unread_count} unread message(s)")
-        else:
-            # Local mode not supported for new message checks
+            # Get all chats
+            if USE_SERVER:
+                token = get_server_token()
+                if not token:
+                    return 0
+                
+                # Get chats from server
+                chats = server_request("chats", token=token, quiet=quiet)
+                if not isinstance(chats, list):
+                    return 0
+                
+                # Count unread messages
+                unread_count = sum(chat.get('unread', 0) for chat in chats)
+                _NEW_MESSAGES_CHECK = (time.monotonic(), unread_count)
+                
+                # Show notification if there are unread messages
+                if unread_count > 0:
+                    # Show system notification
+                    show_notification(f"You have {unread_count} unread message(s)", quiet=quiet)
+                
+                return unread_count
+            else:
+                # Local mode not supported for new message checks
+                pass
+        except Exception as e:
+            # Silently fail for background checks
             pass
-    except Exception as e:
-        # Silently fail for background checks
-        pass
+    
+    return 0
 
 def is_logged_in():
     """Check if a user is logged in"""
@@ -1653,8 +2012,14 @@ def is_logged_in():
     return config.get('logged_in', False)
 
 def get_config():
-    """Get the configuration from the config file"""
-    if not os.path.exists(CONFIG_FILE):
+    """Get the configuration, re-reading the config file only when it has changed
+    
+    A login or logout in another terminal changes the file, so a long running
+    command such as chat mode picks it up on its next call.
+    """
+    try:
+        mtime = os.stat(CONFIG_FILE).st_mtime_ns
+    except FileNotFoundError:
         return {
             'logged_in': False,
             'username': None,
@@ -1663,13 +2028,19 @@ def get_config():
             'use_server': USE_SERVER
         }
     
-    with open(CONFIG_FILE, 'r') as f:
-        return json.load(f)
+    if _CONFIG_CACHE['mtime'] != mtime:
+        _CONFIG_CACHE['data'] = read_json_file(CONFIG_FILE)
+        _CONFIG_CACHE['mtime'] = mtime
+    
+    return _CONFIG_CACHE['data']
 
 def save_config(config):
     """Save the configuration to the config file"""
-    with open(CONFIG_FILE, 'w') as f:
-        json.dump(config, f, indent=2)
+    replace_json_file(CONFIG_FILE, config, indent=True)
+    
+    # The file now holds config, so keep it without reading it back
+    _CONFIG_CACHE['data'] = config
+    _CONFIG_CACHE['mtime'] = os.stat(CONFIG_FILE).st_mtime_ns
 
 def user_exists(username):
     """Check if a user exists"""
@@ -1697,21 +2068,20 @@ def user_exists(username):
     users_file = os.path.join(DATA_DIR, 'users.json')
     if os.path.exists(users_file):
         try:
-            with open(users_file, 'r') as f:
-                users = json.load(f)
-                return username in users
+            users = read_json_file(users_file)
+            return username in users
         except json.JSONDecodeError:
             pass
     
     return False
 
 def clear_terminal():
-    """Clear the terminal screen"""
-    os_name = platform.system().lower()
-    if os_name == 'windows':
-        os.system('cls')
-    else:
-        os.system('clear')
+    """Clear the terminal screen
+    
+    Rich writes the escape sequence itself, or uses the console API on legacy
+    Windows consoles, instead of running a clear or cls shell command.
+    """
+    console.clear()
 
 def show_help():
     help_text = """
@@ -1761,6 +2131,9 @@ def show_help():
     [bold cyan]terminalchat update[/bold cyan] or [bold cyan]tc update[/bold cyan]
         Check for updates
     
+    [bold cyan]terminalchat install[/bold cyan]
+        Create the 'tc' command shortcut (run once after installing)
+    
     [bold cyan]terminalchat uninstall[/bold cyan] or [bold cyan]tc uninstall[/bold cyan]
         Uninstall TerminalChat from your system
     
@@ -1775,12 +2148,91 @@ def show_help():
     clear_terminal()
     console.print(help_text)
 
-def main():
-    # Setup application directories
-    setup_app_directories()
-    
-    # Check for new messages
-    check_for_new_messages()
+# Short names accepted for some commands
+ALIASES = {
+    'chat': 'message',
+    'list': 'chat_list',
+    'send': 'send_file',
+    'delete': 'delete_account'
+}
+
+# Handler for each command
+HANDLERS = {
+    'signup': handle_signup,
+    'login': handle_login,
+    'logout': handle_logout,
+    'message': handle_message,
+    'chat_list': handle_chat_list,
+    'block': handle_block,
+    'unblock': handle_unblock,
+    'blocked': handle_list_blocked,
+    'send_file': handle_send,
+    'status': handle_status,
+    'update': handle_update,
+    'install': handle_install,
+    'uninstall': handle_uninstall,
+    'delete_account': handle_delete_account,
+    'help': lambda args: show_help()
+}
+
+# Everything accepted as the first argument
+VALID_COMMANDS = frozenset(HANDLERS) | frozenset(ALIASES) | {'--version'}
+
+# Commands that take no arguments, so a bare `tc <command>` needs no parser
+NO_ARGUMENT_COMMANDS = frozenset({
+    'logout', 'chat_list', 'blocked', 'status', 'update',
+    'install', 'uninstall', 'delete_account', 'help'
+})
+
+# Commands that work without the server, so they skip the new message check
+OFFLINE_COMMANDS = frozenset({'help', 'install', 'uninstall'})
+
+# Arguments of the parser for each command
+COMMAND_PARSERS = {
+    'signup': [
+        ('username', {'nargs': '?'}),
+        ('--password', {})
+    ],
+    'login': [
+        ('username', {'nargs': '?'}),
+        ('--password', {})
+    ],
+    'logout': [],
+    'message': [
+        ('username', {'nargs': '?'}),
+        ('text', {'nargs': '?'}),
+        ('--page', {})
+    ],
+    'chat_list': [],
+    'block': [
+        ('username', {'nargs': '?'})
+    ],
+    'unblock': [
+        ('username', {'nargs': '?'})
+    ],
+    'blocked': [],
+    'send_file': [
+        ('username', {}),
+        ('file_path', {})
+    ],
+    'status': [],
+    'update': [],
+    'install': [],
+    'uninstall': [],
+    'delete_account': [],
+    'help': []
+}
+
+@lru_cache(maxsize=None)
+def build_parser(command=None):
+    """Build the command line parser
+    
+    Only the parser of the given command is added, since that is the only one
+    the arguments can match. Without a known command every parser is added.
+    Parsers are cached, so a process that runs several commands builds each
+    one only once.
+    """
+    import argparse
     
     # Create the argument parser with custom error handling
     class CustomArgumentParser(argparse.ArgumentParser):
@@ -1794,128 +2246,75 @@ def main():
     parser = CustomArgumentParser(prog='tc', description='TerminalChat - A simple terminal-based chat application')
     parser.add_argument('--version', action='version', version=f'TerminalChat {VERSION}')
     
-    subparsers = parser.add_subparsers(dest='command', help='Command to run')
+    subparsers = parser.add_subparsers(dest='command')
     
-    # Signup command
-    signup_parser = subparsers.add_parser('signup', help='Create a new account')
-    signup_parser.add_argument('username', nargs='?', help='Username for the new account')
-    signup_parser.add_argument('--password', help='Password for the new account')
+    # show_help() documents the commands, so the subparsers carry no help of their own
+    names = [command] if command in COMMAND_PARSERS else COMMAND_PARSERS
+    for name in names:
+        command_parser = subparsers.add_parser(name, add_help=False)
+        for argument, options in COMMAND_PARSERS[name]:
+            command_parser.add_argument(argument, **options)
     
-    # Login command
-    login_parser = subparsers.add_parser('login', help='Log in to your account')
-    login_parser.add_argument('username', nargs='?', help='Username to log in with')
-    login_parser.add_argument('--password', help='Password to log in with')
-    
-    # Logout command
-    logout_parser = subparsers.add_parser('logout', help='Log out from your account')
-    
-    # Message command
-    message_parser = subparsers.add_parser('message', help='Send a message to a user')
-    message_parser.add_argument('username', nargs='?', help='Username to message')
-    message_parser.add_argument('text', nargs='?', help='Message text (optional)')
-    message_parser.add_argument('--page', help='Page number for pagination')
-    
-    # Chat command (alias for message)
-    chat_parser = subparsers.add_parser('chat', help='Chat with a user (alias for message)')
-    chat_parser.add_argument('username', nargs='?', help='Username to chat with')
-    chat_parser.add_argument('text', nargs='?', help='Message text (optional)')
-    chat_parser.add_argument('--page', help='Page number for pagination')
-    
-    # Chat list command
-    chat_list_parser = subparsers.add_parser('chat_list', help='List all your chats')
-    
-    # Simpler alias for chat_list
-    list_parser = subparsers.add_parser('list', help='List all your chats (alias for chat_list)')
-    
-    # Block command
-    block_parser = subparsers.add_parser('block', help='Block a user')
-    block_parser.add_argument('username', nargs='?', help='Username to block')
-    
-    # Unblock command
-    unblock_parser = subparsers.add_parser('unblock', help='Unblock a user')
-    unblock_parser.add_argument('username', nargs='?', help='Username to unblock')
-    
-    # Blocked list command
-    blocked_parser = subparsers.add_parser('blocked', help='List all blocked users')
-    
-    # Send file command
-    send_file_parser = subparsers.add_parser('send_file', help='Send a file to a user')
-    send_file_parser.add_argument('username', help='Username to send file to')
-    send_file_parser.add_argument('file_path', help='Path to file')
+    return parser
+
+def main():
+    command = sys.argv[1] if len(sys.argv) > 1 else None
     
-    # Simpler alias for send_file
-    send_parser = subparsers.add_parser('send', help='Send a file to a user (alias for send_file)')
-    send_parser.add_argument('username', help='Username to send file to')
-    send_parser.add_argument('file_path', help='Path to file')
+    # Help and the version need neither the parser nor the app directories
+    if command in (None, 'help', '-h', '--help'):
+        show_help()
+        return
+    if command == '--version':
+        print(f"TerminalChat {VERSION}")
+        return
     
-    # Status command
-    status_parser = subparsers.add_parser('status', help='Show your current status')
+    # Reject typos before building a parser for them
+    if command not in VALID_COMMANDS:
+        show_invalid_command()
+        return
     
-    # Update command
-    update_parser = subparsers.add_parser('update', help='Check for updates')
+    # Help for a single command is the same help screen, not argparse's
+    if '-h' in sys.argv[2:] or '--help' in sys.argv[2:]:
+        show_help()
+        return
     
-    # Uninstall command
-    uninstall_parser = subparsers.add_parser('uninstall', help='Uninstall TerminalChat')
+    # Aliases run as their full command from here on
+    command = ALIASES.get(command, command)
     
-    # Delete account command
-    delete_account_parser = subparsers.add_parser('delete_account', help='Delete your account')
+    # Setup application directories
+    setup_app_directories()
     
-    # Simpler alias for delete_account
-    delete_parser = subparsers.add_parser('delete', help='Delete your account (alias for delete_account)')
+    # Check for new messages in the background, so the command doesn't wait
+    # for the request. Offline commands skip the check.
+    if command not in OFFLINE_COMMANDS:
+        threading.Thread(target=check_for_new_messages, kwargs={'quiet': True}, daemon=True).start()
     
-    # Help command
-    help_parser = subparsers.add_parser('help', help='Show help information')
+    # Commands without arguments skip building the parser
+    if len(sys.argv) == 2 and command in NO_ARGUMENT_COMMANDS:
+        args = SimpleNamespace(command=command)
+    else:
+        try:
+            args = build_parser(command).parse_args([command] + sys.argv[2:])
+        except SystemExit:
+            # argparse exits after an invalid argument
+            return
     
+    # Handle the command, which is known to be valid by now
     try:
-        # Parse the arguments
-        args = parser.parse_args()
-        
-        # Handle the commands
-        if args.command == 'signup':
-            handle_signup(args)
-        elif args.command == 'login':
-            handle_login(args)
-        elif args.command == 'logout':
-            handle_logout(args)
-        elif args.command == 'message' or args.command == 'chat':
-            handle_message(args)
-        elif args.command == 'chat_list' or args.command == 'list':
-            handle_chat_list(args)
-        elif args.command == 'block':
-            handle_block(args)
-        elif args.command == 'unblock':
-            handle_unblock(args)
-        elif args.command == 'blocked':
-            handle_list_blocked(args)
-        elif args.command == 'send_file' or args.command == 'send':
-            handle_send_file(args)
-        elif args.command == 'status':
-            handle_status(args)
-        elif args.command == 'update':
-            handle_update(args)
-        elif args.command == 'uninstall':
-            handle_uninstall(args)
-        elif args.command == 'delete_account' or args.command == 'delete':
-            handle_delete_account(args)
-        elif args.command == 'help' or not args.command:
-            show_help()
-        else:
-            show_invalid_command()
-    except SystemExit:
-        # This catches the case when argparse exits due to --help
-        pass
+        HANDLERS[args.command](args)
     except Exception as e:
+        from rich.panel import Panel
+        
         console.print(Panel(f"[bold red]An error occurred:[/bold red] {str(e)}", title="Error", border_style="red"))
 
 def show_invalid_command():
-    """Show a nice error message for invalid commands"""
-    clear_terminal()
-    console.print(Panel(
-        "[bold red]Invalid command[/bold red]\n\n"
-        "Run [bold cyan]terminalchat help[/bold cyan] or [bold cyan]tc help[/bold cyan] to see available commands.",
-        title="Error",
-        border_style="red"
-    ))
+    """Show an error message for invalid commands"""
+    # Plain escape codes, so a typo doesn't pay for importing and rendering rich
+    if sys.stderr.isatty():
+        sys.stderr.write("\033[1;31mInvalid command\033[0m\n\n")
+    else:
+        sys.stderr.write("Invalid command\n\n")
+    sys.stderr.write("Run 'terminalchat help' or 'tc help' to see available commands.\n")
 
 # Create a symbolic link for 'tc' command
 def create_tc_symlink():
@@ -1927,13 +2326,18 @@ def create_tc_symlink():
         # Determine common bin directories
         bin_dirs = ['/usr/local/bin', '/usr/bin', os.path.expanduser('~/.local/bin')]
         
-        # Find where terminalchat is installed
+        # Find where terminalchat is installed, without probing the bin
+        # directories when this script is already the installed command
         terminalchat_bin = None
-        for bin_dir in bin_dirs:
-            possible_path = os.path.join(bin_dir, 'terminalchat')
-            if os.path.exists(possible_path):
-                terminalchat_bin = possible_path
-                break
+        if (os.path.basename(terminalchat_path) == 'terminalchat'
+                and os.path.dirname(terminalchat_path) in bin_dirs):
+            terminalchat_bin = terminalchat_path
+        else:
+            for bin_dir in bin_dirs:
+                possible_path = os.path.join(bin_dir, 'terminalchat')
+                if os.path.exists(possible_path):
+                    terminalchat_bin = possible_path
+                    break
         
         if not terminalchat_bin:
             # If we couldn't find it, use the current script path
@@ -1942,16 +2346,18 @@ def create_tc_symlink():
         # Create the tc symlink in the same directory
         tc_bin = os.path.join(os.path.dirname(terminalchat_bin), 'tc')
         
-        # Check if the symlink already exists
-        if os.path.exists(tc_bin):
-            # If it exists but doesn't point to terminalchat, replace it
-            if os.path.islink(tc_bin) and os.readlink(tc_bin) != terminalchat_bin:
-                os.remove(tc_bin)
-                os.symlink(terminalchat_bin, tc_bin)
-        else:
+        # Check if the symlink already exists with a single lstat
+        try:
+            tc_stat = os.lstat(tc_bin)
+        except FileNotFoundError:
             # Create the symlink
             os.symlink(terminalchat_bin, tc_bin)
-            
+        else:
+            # If it is a link that doesn't point to terminalchat, replace it
+            if stat.S_ISLNK(tc_stat.st_mode) and os.readlink(tc_bin) != terminalchat_bin:
+                os.remove(tc_bin)
+                os.symlink(terminalchat_bin, tc_bin)
+        
         return True
     except Exception as e:
         console.print(f"[bold yellow]Note: Could not create 'tc' command shortcut: {str(e)}[/bold yellow]")
@@ -1959,9 +2365,4 @@ def create_tc_symlink():
         return False
 
 if __name__ == "__main__":
-    # Check if the script is being run directly
-    if len(sys.argv) > 1 and sys.argv[0].endswith('terminalchat.py'):
-        # If this is the first run or an update, try to create the tc symlink
-        create_tc_symlink()
-    
     main()
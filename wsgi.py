@@ -0,0 +1,7 @@
+#!/usr/bin/env python3
+
+# WSGI entry point for running the server under gunicorn:
+#   gunicorn -w 1 -k gthread --threads 4 -b 0.0.0.0:$PORT wsgi:application
+from server import app
+
+application = app